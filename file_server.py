@@ -8,6 +8,7 @@ Features: Maximum speed, resume downloads, multi-user support, professional inte
 """
 
 import os
+import stat
 import sys
 import time
 import socket
@@ -15,9 +16,29 @@ import mimetypes
 import subprocess
 import re
 import atexit
-import math
-from flask import Flask, Response, request, render_template_string
-from werkzeug.serving import WSGIRequestHandler
+import signal
+import queue
+import threading
+import functools
+import gzip
+import shutil
+import hashlib
+import tempfile
+import json
+import unicodedata
+from urllib.parse import quote as url_quote
+from concurrent.futures import ThreadPoolExecutor
+import collections
+from datetime import datetime
+import argparse
+from pathlib import Path
+from email.utils import formatdate
+from flask import Flask, Response, request
+from werkzeug.serving import WSGIRequestHandler, make_server
+from werkzeug.http import is_resource_modified, dump_options_header
+from werkzeug.wsgi import wrap_file
+from jinja2 import DictLoader, FileSystemBytecodeCache
+from markupsafe import Markup, escape
 
 # ============================================================================
 # SERVER CONFIGURATION - Maximum Performance Settings
@@ -28,20 +49,28 @@ class ServerConfig:
     
     # Performance Settings - Maximum Speed
     CHUNK_SIZE_MB = 8                    # 8 MB chunks for maximum throughput
-    SOCKET_BUFFER_MB = 4                 # 4 MB socket buffers
+    SOCKET_BUFFER_MB = 0                 # 0 = kernel autotuning; set only if net.core.{r,w}mem_max are raised too
     MAX_FILE_SIZE_GB = 16                # 16 GB file size limit
     
     # Calculated values
-    CHUNK_SIZE = CHUNK_SIZE_MB * 1024 * 1024
+    CHUNK_SIZE = max(64 * 1024, int(CHUNK_SIZE_MB * 1024 * 1024) // 4096 * 4096)  # Page aligned, 64 KB floor
     SOCKET_BUFFER_SIZE = SOCKET_BUFFER_MB * 1024 * 1024
     MAX_CONTENT_LENGTH = MAX_FILE_SIZE_GB * 1024 * 1024 * 1024
     
     # Features - All Enabled
     ENABLE_RANGE_REQUESTS = True         # Resume downloads support
     ENABLE_THREADING = True              # Multiple users & files
+    WORKER_THREADS = 16                  # Request threads behind the waitress event loop
+    WORKER_PROCESSES = os.cpu_count() or 1  # SO_REUSEPORT server processes (POSIX only)
     ENABLE_CACHE = True                  # HTTP caching
     CACHE_HOURS = 1                      # 1 hour cache
     CACHE_MAX_AGE = CACHE_HOURS * 3600
+    ENABLE_COMPRESSION = True            # gzip/br/zstd for text-like files
+    COMPRESS_MIN_SIZE = 1024             # Not worth compressing below 1 KB
+    COMPRESS_MAX_SIZE = 64 * 1024 * 1024   # Larger files are always sent as-is
+    COMPRESS_INLINE_MAX_SIZE = 4 * 1024 * 1024  # Bigger ones are compressed in the background
+    COMPRESSION_CACHE_MAX_BYTES = 1024 ** 3     # Oldest compressed copies are evicted beyond this
+    METADATA_TTL_SECONDS = 2             # Directory metadata refresh interval
     
     # UI Settings
     UI_STYLE = "professional"            # Professional with file details
@@ -49,6 +78,7 @@ class ServerConfig:
     
     # Server Settings (will be set by user)
     SHARE_DIR = None
+    SHARE_DIR_PREFIX = None              # SHARE_DIR with trailing separator, for containment checks
     PORT = 8000
     HOST = '0.0.0.0'
     DEBUG_MODE = False
@@ -57,46 +87,110 @@ class ServerConfig:
     CLOUDFLARE_URL = None
     CLOUDFLARE_PROCESS = None
 
+# Response header values fixed by the configuration, built once
+CACHE_CONTROL = f'public, max-age={ServerConfig.CACHE_MAX_AGE}'
+
+# Python-streamed bodies are yielded in slices this size so the WSGI server
+# starts sending before a whole chunk has been read
+STREAM_SLICE_SIZE = min(ServerConfig.CHUNK_SIZE, 256 * 1024)
+
+# sendfile(2) is only available on POSIX; Windows falls back to Python streaming
+HAS_SENDFILE = hasattr(os, 'sendfile')
+SENDFILE_MAX_BLOCK = 1 << 30             # Largest region handed to one sendfile() call
+
+# Kernel page-cache hints (POSIX only)
+HAS_FADVISE = hasattr(os, 'posix_fadvise')
+READAHEAD_WINDOW = 64 * 1024 * 1024      # Prefetch at most this much up front
+DROP_CACHE_THRESHOLD = 1024 ** 3         # Release pages after streaming regions this large
+
+# Load the system MIME database once at startup instead of on the first request
+mimetypes.init()
+
+# Per-connection TCP options: Nagle off so small writes aren't held for delayed ACKs
+TCP_SOCKET_OPTIONS = [(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)]
+
+# Holds back partial segments so headers share a packet with the first body bytes
+TCP_CORK_OPTION = getattr(socket, 'TCP_CORK', None) or getattr(socket, 'TCP_NOPUSH', None)
+
+# Parent-directory segments, NUL bytes and absolute paths are rejected before touching the disk
+UNSAFE_PATH_PATTERN = re.compile(
+    r'(^|[/\\])\.\.([/\\]|$)|\x00|^[/\\]' + (r'|:' if sys.platform == 'win32' else '')
+)
+
+# Single "bytes=start-end" range; either bound may be empty
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+def configure_share_dir(share_dir):
+    """Set the shared directory and precompute its normalized prefix"""
+    ServerConfig.SHARE_DIR = os.path.realpath(share_dir)
+    ServerConfig.SHARE_DIR_PREFIX = os.path.join(ServerConfig.SHARE_DIR, '')
+
+DEFAULT_SHARE_DIR = r"D:\server\index"
+
+def parse_arguments(argv=None):
+    """Parse command-line options, defaulting to the SHARE_DIR and PORT environment variables"""
+    parser = argparse.ArgumentParser(description="High-performance file server")
+    parser.add_argument('--dir', default=os.environ.get('SHARE_DIR'),
+                        help=f"directory to share (env SHARE_DIR, default {DEFAULT_SHARE_DIR})")
+    parser.add_argument('--port', type=int, default=os.environ.get('PORT', str(ServerConfig.PORT)),
+                        help=f"port to listen on (env PORT, default {ServerConfig.PORT})")
+    parser.add_argument('--interactive', action='store_true',
+                        help="prompt for directory and port even when they are given")
+    return parser.parse_args(argv)
+
 # Get user input for configuration
-def get_user_configuration():
-    """Prompt user for directory and port configuration"""
+def get_user_configuration(args):
+    """Apply directory and port from the arguments, prompting only in interactive mode"""
     
     print("=" * 80)
     print("🚀 HIGH-PERFORMANCE FILE SERVER                          𝓓𝓮𝓿𝓮𝓵𝓸𝓹𝓮𝓭 𝓫𝔂 𝓑𝓲𝓫𝓮𝓴.....")
     print("=" * 80)
     print()
     
+    # Prompts are kept for double-click launches (no directory given, attached to
+    # a console); services and scripts start straight from arguments/environment
+    interactive = args.interactive or (args.dir is None and sys.stdin is not None and sys.stdin.isatty())
+    ServerConfig.PORT = args.port
+    
     # Get share directory
     print("📁 DIRECTORY CONFIGURATION:")
-    default_dir = r"D:\server\index"
-    
-    while True:
-        share_dir = input(f"Enter directory path to share (or press Enter for '{default_dir}'): ").strip()
-        
-        if not share_dir:
-            share_dir = default_dir
-        
-        # Remove quotes if user pasted path with quotes
-        share_dir = share_dir.strip('"').strip("'")
-        
-        # Normalize path
-        share_dir = os.path.abspath(share_dir)
-        
-        if os.path.exists(share_dir) and os.path.isdir(share_dir):
-            ServerConfig.SHARE_DIR = share_dir
-            print(f"✅ Selected directory: {share_dir}")
-            break
-        else:
+    if interactive:
+        while True:
+            share_dir = input(f"Enter directory path to share (or press Enter for '{DEFAULT_SHARE_DIR}'): ").strip()
+            
+            if not share_dir:
+                share_dir = DEFAULT_SHARE_DIR
+            
+            # Remove quotes if user pasted path with quotes
+            share_dir = share_dir.strip('"').strip("'")
+            
+            # Normalize path
+            share_dir = os.path.abspath(share_dir)
+            
+            if os.path.isdir(share_dir):
+                break
             print(f"❌ Directory not found: {share_dir}")
             print("Please enter a valid directory path.")
             print()
+    else:
+        share_dir = args.dir or DEFAULT_SHARE_DIR
+        try:
+            share_dir = str(Path(share_dir).resolve(strict=True))
+        except OSError:
+            pass
+        if not os.path.isdir(share_dir):
+            print(f"❌ Directory not found: {share_dir}")
+            sys.exit(1)
     
-    # Count files in directory
+    configure_share_dir(share_dir)
+    print(f"✅ Selected directory: {share_dir}")
+    
+    # Count files with the same scandir pass that warms the metadata cache
     try:
-        file_count = len([f for f in os.listdir(ServerConfig.SHARE_DIR) 
-                        if os.path.isfile(os.path.join(ServerConfig.SHARE_DIR, f))])
+        file_cache.refresh()
+        file_count = len(file_cache.names)
         print(f"✅ Found {file_count} files in directory")
-    except:
+    except OSError:
         file_count = 0
     
     print()
@@ -104,7 +198,10 @@ def get_user_configuration():
     # Get port
     print("🌐 PORT CONFIGURATION:")
     while True:
-        port_input = input(f"Enter port number (default: {ServerConfig.PORT}): ").strip()
+        if interactive:
+            port_input = input(f"Enter port number (default: {ServerConfig.PORT}): ").strip()
+        else:
+            port_input = str(ServerConfig.PORT)
         
         if not port_input:
             port_input = str(ServerConfig.PORT)
@@ -119,6 +216,9 @@ def get_user_configuration():
                 print("❌ Port must be between 1024 and 65535")
         except ValueError:
             print("❌ Invalid port number. Please enter a number.")
+        
+        if not interactive:
+            sys.exit(1)
     
     print()
     print("-" * 80)
@@ -136,24 +236,436 @@ class OptimizedRequestHandler(WSGIRequestHandler):
     
     def setup(self):
         super().setup()
-        try:
-            # Set large socket buffers for maximum throughput
-            self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, ServerConfig.SOCKET_BUFFER_SIZE)
-            self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, ServerConfig.SOCKET_BUFFER_SIZE)
-        except Exception as e:
-            if ServerConfig.DEBUG_MODE:
-                print(f"⚠️ Socket buffer setup warning: {e}")
+        # Fixed buffer sizes switch off Linux TCP autotuning, so only apply an explicit setting
+        if ServerConfig.SOCKET_BUFFER_SIZE:
+            try:
+                self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, ServerConfig.SOCKET_BUFFER_SIZE)
+                self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, ServerConfig.SOCKET_BUFFER_SIZE)
+            except Exception as e:
+                if ServerConfig.DEBUG_MODE:
+                    print(f"⚠️ Socket buffer setup warning: {e}")
+        
+        # Apply the per-connection TCP options
+        for level, option, value in TCP_SOCKET_OPTIONS:
+            try:
+                self.connection.setsockopt(level, option, value)
+            except OSError as e:
+                if ServerConfig.DEBUG_MODE:
+                    print(f"⚠️ Socket option {option} warning: {e}")
+    
+    def log_request(self, code='-', size='-'):
+        """Hand the access-log entry to the background writer instead of formatting it here"""
+        queue_log(('access', self.client_address[0], time.time(), self.requestline, code, size))
+
+# Access-log entries and streaming errors from request threads, written to stderr in batches
+log_queue = queue.SimpleQueue()
+LOG_FLUSH_INTERVAL = 0.1                 # Seconds between log flushes
+log_writer_pid = None                    # Process whose writer thread drains log_queue
+log_writer_lock = threading.Lock()
+
+def log_stream_error(filename, error):
+    """Queue a streaming failure for the log writer; never blocks the sending thread"""
+    queue_log(('stream', filename, error))
+
+def queue_log(entry):
+    """Queue a log entry, starting this process's writer on first use"""
+    if log_writer_pid != os.getpid():
+        start_log_writer()
+    log_queue.put_nowait(entry)
 
+def start_log_writer():
+    """Start the writer thread once per process; forked workers don't inherit the parent's"""
+    global log_writer_pid, log_queue
+    with log_writer_lock:
+        if log_writer_pid == os.getpid():
+            return
+        if log_writer_pid is not None:
+            log_queue = queue.SimpleQueue()  # Entries copied at fork are the parent's to write
+        log_writer_pid = os.getpid()
+    threading.Thread(target=drain_log, daemon=True, name='log-writer').start()
+
+def drain_log():
+    """Format queued log entries (access lines in Common Log Format) and write them in batches"""
+    while True:
+        entries = [log_queue.get()]
+        time.sleep(LOG_FLUSH_INTERVAL)
+        while True:
+            try:
+                entries.append(log_queue.get_nowait())
+            except queue.Empty:
+                break
+        lines = []
+        for kind, *fields in entries:
+            if kind == 'stream':
+                filename, error = fields
+                lines.append(f"❌ Error streaming {filename}: {error}\n")
+                continue
+            host, ts, line, code, size = fields
+            stamp = time.strftime('%d/%b/%Y %H:%M:%S', time.localtime(ts))
+            lines.append(f'{host} - - [{stamp}] "{line}" {getattr(code, "value", code)} {size}\n')
+        sys.stderr.write(''.join(lines))
+        sys.stderr.flush()
+
+SIZE_NAMES = ("B", "KB", "MB", "GB", "TB", "PB")
+
+@functools.lru_cache(maxsize=4096)
 def format_size(size_bytes):
     """Format file size in human readable format"""
     if size_bytes == 0:
         return "0 B"
     
-    size_names = ["B", "KB", "MB", "GB", "TB"]
-    i = int(math.floor(math.log(size_bytes, 1024)))
-    p = math.pow(1024, i)
-    s = round(size_bytes / p, 2)
-    return f"{s} {size_names[i]}"
+    # Every unit is 2**10 of the previous one, so the bit length picks the unit
+    i = min((size_bytes.bit_length() - 1) // 10, len(SIZE_NAMES) - 1)
+    s = round(size_bytes / (1 << (i * 10)), 2)
+    return f"{s} {SIZE_NAMES[i]}"
+
+@functools.lru_cache(maxsize=4096)
+def format_mtime(seconds):
+    """Listing timestamp for a whole-second mtime, memoized"""
+    return datetime.fromtimestamp(seconds).isoformat(' ', 'seconds')
+
+@functools.lru_cache(maxsize=4096)
+def http_date(seconds):
+    """Last-Modified value for a whole-second mtime, memoized"""
+    return formatdate(seconds, usegmt=True)
+
+@functools.lru_cache(maxsize=256)
+def mimetype_for_extension(ext):
+    """Content-Type for a lowercase extension, memoized across requests"""
+    return mimetypes.types_map.get(ext) or mimetypes.guess_type('x' + ext)[0] or 'application/octet-stream'
+
+def guess_mimetype(filename):
+    """Content-Type for a file name, cached per extension"""
+    return mimetype_for_extension(os.path.splitext(filename)[1].lower())
+
+@functools.lru_cache(maxsize=4096)
+def content_disposition(filename):
+    """Attachment header value; quotes are escaped and non-ASCII names get an RFC 5987 filename*"""
+    try:
+        filename.encode('ascii')
+    except UnicodeEncodeError:
+        fallback = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        return dump_options_header('attachment', {
+            'filename': fallback,
+            'filename*': "UTF-8''" + url_quote(filename, safe="!#$&+^`|~")
+        })
+    return dump_options_header('attachment', {'filename': filename})
+
+def make_etag(st):
+    """Strong ETag from size, mtime and inode - changes whenever the file does"""
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}-{st.st_ino:x}"'
+
+# ============================================================================
+# FILE METADATA CACHE - One directory scan shared by all requests
+# ============================================================================
+
+PARALLEL_STAT_THRESHOLD = 200           # Above this many files, overlap stat() round trips
+STAT_WORKERS = 16
+
+def stat_entry(entry):
+    """stat() a DirEntry, or None if the file was deleted since the scandir"""
+    try:
+        return entry.stat()
+    except FileNotFoundError:
+        return None
+
+def stat_entries(entries):
+    """stat() every DirEntry, in parallel for large directories"""
+    if len(entries) <= PARALLEL_STAT_THRESHOLD:
+        return [stat_entry(entry) for entry in entries]
+    with ThreadPoolExecutor(max_workers=STAT_WORKERS) as pool:
+        return list(pool.map(stat_entry, entries))
+
+class FileMetadataCache:
+    """Struct-of-arrays snapshot of the files in SHARE_DIR, rebuilt on a short TTL"""
+    
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.lock = threading.RLock()
+        self.loaded_at = None
+        self.version = 0                 # Bumped whenever the listing changes
+        self.refreshing_pid = None       # Process with a background rescan in flight
+        
+        # Parallel arrays, all indexed by the position stored in self.index
+        self.names = []
+        self.paths = []
+        self.sizes = []
+        self.mtimes = []
+        self.mimetypes = []
+        self.last_modified = []          # Preformatted Last-Modified header values
+        self.etags = []
+        self.content_lengths = []        # Preformatted Content-Length header values
+        self.index = {}
+    
+    def refresh(self):
+        """Rebuild every array from a single os.scandir pass"""
+        with os.scandir(ServerConfig.SHARE_DIR) as it:
+            entries = sorted((e for e in it if e.is_file()), key=lambda e: e.name)
+        
+        names, paths, sizes, mtimes, mimes, last_modified, etags, lengths = [], [], [], [], [], [], [], []
+        for entry, st in zip(entries, stat_entries(entries)):
+            if st is None:
+                continue  # Vanished mid-scan; one missing file mustn't fail the whole snapshot
+            names.append(entry.name)
+            paths.append(entry.path)
+            sizes.append(st.st_size)
+            mtimes.append(st.st_mtime)
+            mimes.append(guess_mimetype(entry.name))
+            last_modified.append(http_date(int(st.st_mtime)))
+            etags.append(make_etag(st))
+            lengths.append(str(st.st_size))
+        
+        with self.lock:
+            if (names, sizes, mtimes) != (self.names, self.sizes, self.mtimes):
+                self.version += 1
+            self.names = names
+            self.paths = paths
+            self.sizes = sizes
+            self.mtimes = mtimes
+            self.mimetypes = mimes
+            self.last_modified = last_modified
+            self.etags = etags
+            self.content_lengths = lengths
+            self.index = {name: i for i, name in enumerate(names)}
+            self.loaded_at = time.monotonic()
+    
+    def ensure_fresh(self):
+        """Load the first snapshot; after that, rescan in the background once it is older than the TTL"""
+        if self.loaded_at is None:
+            with self.lock:
+                if self.loaded_at is None:
+                    self.refresh()  # Nothing to serve yet, so the first scan is synchronous
+            return
+        if time.monotonic() - self.loaded_at < self.ttl:
+            return
+        
+        # Requests keep reading the stale arrays while one thread rebuilds them;
+        # refresh() only takes the lock to swap the new arrays in
+        with self.lock:
+            if self.refreshing_pid == os.getpid():
+                return
+            self.refreshing_pid = os.getpid()
+        threading.Thread(target=self.background_refresh, daemon=True, name='metadata-refresh').start()
+    
+    def background_refresh(self):
+        """Rescan off the request path, backing off for a TTL if the directory can't be read"""
+        try:
+            self.refresh()
+        except OSError as e:
+            print(f"⚠️ Could not rescan {ServerConfig.SHARE_DIR}: {e}")
+            self.loaded_at = time.monotonic()
+        finally:
+            self.refreshing_pid = None
+    
+    def lookup(self, name):
+        """Return (path, size, mtime, mimetype, last_modified, etag, content_length) or None if not cached"""
+        self.ensure_fresh()
+        with self.lock:
+            i = self.index.get(name)
+            if i is None:
+                return None
+            return (self.paths[i], self.sizes[i], self.mtimes[i], self.mimetypes[i],
+                    self.last_modified[i], self.etags[i], self.content_lengths[i])
+    
+    def snapshot(self):
+        """Return (version, names, sizes, mtimes) for the current listing"""
+        self.ensure_fresh()
+        with self.lock:
+            return self.version, self.names, self.sizes, self.mtimes
+
+file_cache = FileMetadataCache(ServerConfig.METADATA_TTL_SECONDS)
+
+# Change notifications (inotify / ReadDirectoryChangesW) replace rescans when watchfiles is installed
+try:
+    import watchfiles
+except ImportError:
+    watchfiles = None
+WATCHED_METADATA_TTL = 60                # Safety-net rescan interval while the watcher runs
+watcher_stop = threading.Event()
+
+def watch_share_dir():
+    """Rebuild the metadata snapshot whenever SHARE_DIR changes"""
+    try:
+        for _changes in watchfiles.watch(ServerConfig.SHARE_DIR, recursive=False, stop_event=watcher_stop):
+            try:
+                file_cache.refresh()
+            except OSError as e:
+                # Keep watching: the next event or safety-net rescan tries again
+                print(f"⚠️ Metadata refresh failed: {e}")
+    except Exception as e:
+        print(f"⚠️ Directory watcher stopped, rescanning every {ServerConfig.METADATA_TTL_SECONDS}s instead: {e}")
+    file_cache.ttl = ServerConfig.METADATA_TTL_SECONDS
+
+def start_share_watcher():
+    """Start this process's directory watcher; listings then skip the periodic rescans"""
+    if watchfiles is None:
+        return
+    file_cache.ttl = WATCHED_METADATA_TTL
+    watcher = threading.Thread(target=watch_share_dir, daemon=True, name='share-watcher')
+    watcher.start()
+    
+    # The watcher blocks in native code; it has to return before the interpreter shuts down
+    def stop_watcher():
+        watcher_stop.set()
+        watcher.join(timeout=1)
+    atexit.register(stop_watcher)
+
+# ============================================================================
+# CONTENT COMPRESSION - Precompressed variants for text-like files
+# ============================================================================
+
+COMPRESSIBLE_MIMETYPE = re.compile(
+    r'^(text/|image/svg\+xml$|application/(json|xml|javascript|x-javascript|ecmascript'
+    r'|x-sh|x-csh|sql|rtf|x-tex|x-latex|x-yaml|toml|ld\+json|[\w.-]+\+(json|xml))$)'
+)
+
+@functools.lru_cache(maxsize=None)
+def compression_cache_dir():
+    """Directory for compressed copies: per user, mode 0700, and verified to be ours"""
+    # Cached copies are served as file contents, so nobody else may be able to plant them
+    cache_dir = os.path.join(tempfile.gettempdir(), 'HighPerformanceFileServer-compressed')
+    if not hasattr(os, 'getuid'):
+        os.makedirs(cache_dir, exist_ok=True)
+        return cache_dir  # Windows temp directories are already per user
+    cache_dir = f'{cache_dir}-{os.getuid()}'
+    try:
+        os.mkdir(cache_dir, 0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(cache_dir)
+    if st.st_uid != os.getuid() or not stat.S_ISDIR(st.st_mode) or stat.S_IMODE(st.st_mode) & 0o077:
+        raise PermissionError(f"{cache_dir} is not a private directory owned by this user")
+    return cache_dir
+
+def gzip_compress_file(src, dst):
+    with gzip.GzipFile(fileobj=dst, mode='wb', compresslevel=6, mtime=0) as gz:
+        shutil.copyfileobj(src, gz, 1024 * 1024)
+
+# Encoders in order of preference; zstd and brotli are used only when installed
+CONTENT_ENCODERS = {}
+try:
+    import zstandard
+    
+    def zstd_compress_file(src, dst):
+        zstandard.ZstdCompressor(level=3).copy_stream(src, dst)
+    
+    CONTENT_ENCODERS['zstd'] = zstd_compress_file
+except ImportError:
+    pass
+try:
+    import brotli
+    
+    def brotli_compress_file(src, dst):
+        compressor = brotli.Compressor(quality=5)
+        for block in iter(lambda: src.read(1024 * 1024), b''):
+            dst.write(compressor.process(block))
+        dst.write(compressor.finish())
+    
+    CONTENT_ENCODERS['br'] = brotli_compress_file
+except ImportError:
+    pass
+CONTENT_ENCODERS['gzip'] = gzip_compress_file
+
+def negotiate_encoding(mimetype, file_size):
+    """Pick the best Content-Encoding the client accepts, or None to send as-is"""
+    if (not ServerConfig.ENABLE_COMPRESSION
+            or not ServerConfig.COMPRESS_MIN_SIZE <= file_size <= ServerConfig.COMPRESS_MAX_SIZE
+            or not COMPRESSIBLE_MIMETYPE.match(mimetype)):
+        return None
+    return request.accept_encodings.best_match(list(CONTENT_ENCODERS))
+
+# One lock per variant being built, so concurrent first requests compress once
+compression_locks = {}
+compression_locks_guard = threading.Lock()
+STALE_TEMP_SECONDS = 3600                # Temp files this old were left by a crashed build
+
+def compressed_variant(file_path, etag, encoding, file_size):
+    """Return (path, size) of the encoded copy, or None while a large one is still being built"""
+    # Keyed by the identity ETag, so every encoding of one file version shares a prefix
+    path_key = hashlib.sha1(file_path.encode('utf-8', 'surrogateescape')).hexdigest()[:20]
+    etag_key = hashlib.sha1(etag.encode('utf-8')).hexdigest()[:16]
+    variant_path = os.path.join(compression_cache_dir(), f'{path_key}-{etag_key}.{encoding}')
+    try:
+        return variant_path, os.path.getsize(variant_path)
+    except OSError:
+        pass
+    
+    with compression_locks_guard:
+        lock = compression_locks.setdefault(variant_path, threading.Lock())
+    
+    # Large files would stall the response; send them as-is until the copy exists
+    if file_size > ServerConfig.COMPRESS_INLINE_MAX_SIZE:
+        if lock.acquire(blocking=False):
+            threading.Thread(target=build_variant_in_background, daemon=True, name='compress',
+                             args=(lock, file_path, variant_path, encoding)).start()
+        return None
+    
+    with lock:
+        # Another request may have built it while this one waited
+        if not os.path.exists(variant_path):
+            build_variant(file_path, variant_path, encoding)
+    return variant_path, os.path.getsize(variant_path)
+
+def build_variant_in_background(lock, file_path, variant_path, encoding):
+    """Build a variant off the request path; lock is already held and released here"""
+    try:
+        build_variant(file_path, variant_path, encoding)
+    except OSError as e:
+        print(f"⚠️ Compression failed for {file_path}: {e}")
+    finally:
+        lock.release()
+
+def build_variant(file_path, variant_path, encoding):
+    """Compress file_path into variant_path, then prune the cache directory"""
+    # Write to a private temp file, then atomically publish it for other requests
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(variant_path))
+    try:
+        with open(file_path, 'rb') as src, os.fdopen(fd, 'wb') as dst:
+            CONTENT_ENCODERS[encoding](src, dst)
+        os.replace(tmp_path, variant_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    finally:
+        with compression_locks_guard:
+            compression_locks.pop(variant_path, None)
+    prune_compression_cache(variant_path)
+
+def prune_compression_cache(new_variant):
+    """Drop older versions of new_variant's file, abandoned temp files, and the oldest copies over the cap"""
+    name = os.path.basename(new_variant)
+    same_file = name.split('-', 1)[0] + '-'
+    current = name.split('.', 1)[0] + '.'
+    now = time.time()
+    kept = []
+    try:
+        with os.scandir(os.path.dirname(new_variant)) as it:
+            for entry in it:
+                try:
+                    st = entry.stat()
+                    if entry.name.startswith(same_file) and not entry.name.startswith(current):
+                        os.unlink(entry.path)  # The source changed, so its etag (and key) moved on
+                    elif entry.name.startswith('tmp'):
+                        if now - st.st_mtime > STALE_TEMP_SECONDS:
+                            os.unlink(entry.path)
+                    else:
+                        kept.append((st.st_mtime, st.st_size, entry.path))
+                except OSError:
+                    pass  # Already gone, or still open for sending on Windows
+    except OSError:
+        return
+    
+    total = sum(size for _, size, _ in kept)
+    for _, size, path in sorted(kept):
+        if total <= ServerConfig.COMPRESSION_CACHE_MAX_BYTES:
+            break
+        if path == new_variant:
+            continue
+        try:
+            os.unlink(path)
+            total -= size
+        except OSError:
+            pass
 
 # ============================================================================
 # FILE DOWNLOAD ROUTE - Optimized for Maximum Speed
@@ -162,101 +674,233 @@ def format_size(size_bytes):
 @app.route('/<path:filename>')
 def download_file(filename):
     """High-performance file download with resume support"""
-    file_path = os.path.join(ServerConfig.SHARE_DIR, filename)
+    if UNSAFE_PATH_PATTERN.search(filename):
+        return "❌ Access denied", 403
     
-    # Security and existence checks
-    if not os.path.exists(file_path) or not os.path.isfile(file_path):
-        return "❌ File not found", 404
+    # Top-level files are served straight from the metadata cache; cached
+    # names are real directory entries, so no traversal check is needed
+    cached = file_cache.lookup(filename)
+    if cached:
+        file_path, file_size, mtime, mimetype, last_modified, etag, content_length = cached
+    else:
+        # Containment is checked against the precomputed prefix before any syscall
+        file_path = os.path.normpath(os.path.join(ServerConfig.SHARE_DIR, filename))
+        if not file_path.startswith(ServerConfig.SHARE_DIR_PREFIX):
+            return "❌ Access denied", 403
+        
+        # Existence and type from a single stat() call
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return "❌ File not found", 404
+        if not stat.S_ISREG(st.st_mode):
+            return "❌ File not found", 404
+        
+        # File information
+        file_size = st.st_size
+        mimetype = guess_mimetype(filename)
+        last_modified = http_date(int(st.st_mtime))
+        etag = make_etag(st)
+        content_length = str(file_size)
     
-    if not os.path.abspath(file_path).startswith(os.path.abspath(ServerConfig.SHARE_DIR)):
-        return "❌ Access denied", 403
+    # Range requests always address the identity bytes, so only full downloads are encoded.
+    # HEAD (players probing Content-Length) describes the identity file too, so it never
+    # builds a compressed copy, and file_body() doesn't open the file for it.
+    # Multi-range, other units and malformed headers are ignored: the full file is a valid answer
+    range_header = request.headers.get('Range') if ServerConfig.ENABLE_RANGE_REQUESTS else None
+    byte_range = parse_range_header(range_header, file_size) if range_header else None
+    if byte_range or request.method == 'HEAD':
+        encoding = None
+    else:
+        encoding = negotiate_encoding(mimetype, file_size)
+    identity_etag = etag
+    if encoding:
+        etag = f'{etag[:-1]}-{encoding}"'
     
-    # File information
-    file_size = os.path.getsize(file_path)
-    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    # Client already has this version: answer 304 without touching the file
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return Response(status=304, headers={
+            'ETag': etag,
+            'Last-Modified': last_modified,
+            'Cache-Control': CACHE_CONTROL
+        })
     
     # Handle range requests for resume capability
-    range_header = request.headers.get('Range') if ServerConfig.ENABLE_RANGE_REQUESTS else None
-    if range_header:
-        return handle_range_request(file_path, file_size, range_header, mimetype, filename)
+    if byte_range:
+        return handle_range_request(file_path, file_size, byte_range, mimetype, filename, etag)
     
-    # Full file download with maximum speed streaming
-    def stream_file():
+    # Serve the cached compressed copy through the same streaming paths
+    if encoding:
         try:
-            with open(file_path, 'rb', buffering=ServerConfig.CHUNK_SIZE) as f:
-                while True:
-                    chunk = f.read(ServerConfig.CHUNK_SIZE)
-                    if not chunk:
-                        break
-                    yield chunk
-        except Exception as e:
-            print(f"❌ Error streaming {filename}: {e}")
-            return
+            variant = compressed_variant(file_path, identity_etag, encoding, file_size)
+        except OSError as e:
+            print(f"⚠️ Compression failed for {filename}: {e}")
+            variant = None
+        if variant:
+            file_path, file_size = variant
+            content_length = str(file_size)
+        else:
+            encoding = None
+            etag = identity_etag
+    
+    body = file_body(file_path, 0, file_size, filename)
     
     # Prepare response headers
     headers = {
-        'Content-Length': str(file_size),
+        'Content-Length': content_length,
         'Content-Type': mimetype,
-        'Content-Disposition': f'attachment; filename="{filename}"',
+        'Content-Disposition': content_disposition(filename),
         'Accept-Ranges': 'bytes',
-        'Cache-Control': f'public, max-age={ServerConfig.CACHE_MAX_AGE}',
-        'Last-Modified': time.strftime('%a, %d %b %Y %H:%M:%S GMT', 
-                                      time.gmtime(os.path.getmtime(file_path)))
+        'Cache-Control': CACHE_CONTROL,
+        'Last-Modified': last_modified,
+        'ETag': etag
     }
+    if encoding:
+        # Byte offsets of the encoded copy aren't stable across encoders
+        headers['Content-Encoding'] = encoding
+        headers['Accept-Ranges'] = 'none'
+    if ServerConfig.ENABLE_COMPRESSION and COMPRESSIBLE_MIMETYPE.match(mimetype):
+        headers['Vary'] = 'Accept-Encoding'
     
-    return Response(stream_file(), headers=headers)
+    return Response(body, headers=headers, direct_passthrough=True)
 
-def handle_range_request(file_path, file_size, range_header, mimetype, filename):
-    """Handle HTTP range requests for partial content/resume downloads"""
-    byte_start = 0
-    byte_end = file_size - 1
+def file_body(file_path, offset, count, filename):
+    """Response body for a file region, using the cheapest path the WSGI server offers"""
+    if request.method == 'HEAD':
+        return ()  # Headers only; don't open the file
     
+    # waitress/gunicorn send from the file position up to Content-Length on their own
+    # I/O path, so a slow download doesn't hold a request thread for the whole transfer
+    if 'wsgi.file_wrapper' in request.environ:
+        try:
+            f = open(file_path, 'rb', buffering=0)
+        except OSError as e:
+            log_stream_error(filename, e)
+            return ()
+        if offset:
+            f.seek(offset)
+        advise_sequential(f.fileno(), offset, count)
+        return wrap_file(request.environ, f, STREAM_SLICE_SIZE)
+    
+    # Werkzeug server: let the kernel move the file straight to the socket
+    sock = request.environ.get('werkzeug.socket') if HAS_SENDFILE else None
+    if sock:
+        return sendfile_stream(sock, file_path, offset, count, filename)
+    return read_stream(file_path, offset, count, filename)
+
+def advise_sequential(fd, offset, length):
+    """Tell the kernel the region will be read front to back so it can read ahead"""
+    if not HAS_FADVISE:
+        return
+    try:
+        os.posix_fadvise(fd, offset, length, os.POSIX_FADV_SEQUENTIAL)
+        os.posix_fadvise(fd, offset, min(length, READAHEAD_WINDOW), os.POSIX_FADV_WILLNEED)
+    except OSError:
+        pass
+
+def advise_done(fd, offset, length):
+    """Drop a large one-shot region from the page cache so it doesn't evict hot files"""
+    if not HAS_FADVISE or length < DROP_CACHE_THRESHOLD:
+        return
+    try:
+        os.posix_fadvise(fd, offset, length, os.POSIX_FADV_DONTNEED)
+    except OSError:
+        pass
+
+def read_stream(file_path, offset, count, filename):
+    """Stream a file region with plain reads on a private unbuffered descriptor"""
+    # Reads, unlike a memory map, just come up short if the file is truncated
+    # mid-download instead of raising SIGBUS and killing the worker
+    try:
+        with open(file_path, 'rb', buffering=0) as f:
+            fd = f.fileno()
+            f.seek(offset)
+            advise_sequential(fd, offset, count)
+            read, chunk_size = f.read, STREAM_SLICE_SIZE  # Local lookups inside the loop
+            remaining = count
+            while remaining > 0:
+                chunk = read(chunk_size if remaining > chunk_size else remaining)
+                if not chunk:
+                    break  # File was truncated while sending
+                remaining -= len(chunk)
+                yield chunk
+            advise_done(fd, offset, count)
+    except Exception as e:
+        log_stream_error(filename, e)
+
+def sendfile_stream(sock, file_path, offset, count, filename):
+    """Send a file region with sendfile(2), bypassing Python buffers entirely"""
     try:
-        if range_header.startswith('bytes='):
-            range_spec = range_header[6:]
-            ranges = range_spec.split(',')[0]
+        fd = os.open(file_path, os.O_RDONLY)
+        try:
+            # Cork the socket so the headers go out together with the first data
+            if TCP_CORK_OPTION:
+                sock.setsockopt(socket.IPPROTO_TCP, TCP_CORK_OPTION, 1)
             
-            if '-' in ranges:
-                start, end = ranges.split('-', 1)
-                if start:
-                    byte_start = int(start)
-                if end:
-                    byte_end = min(int(end), file_size - 1)
-    except ValueError:
-        return "❌ Invalid range request", 400
-    
-    if byte_start < 0 or byte_start >= file_size or byte_end < byte_start:
+            # Empty chunk makes the server flush status line and headers first
+            yield b''
+            
+            advise_sequential(fd, offset, count)
+            start, out_fd = offset, sock.fileno()
+            sendfile, max_block = os.sendfile, SENDFILE_MAX_BLOCK
+            remaining = count
+            while remaining > 0:
+                sent = sendfile(out_fd, fd, offset, max_block if remaining > max_block else remaining)
+                if not sent:
+                    break  # File was truncated while sending
+                offset += sent
+                remaining -= sent
+            advise_done(fd, start, count)
+        finally:
+            os.close(fd)
+            if TCP_CORK_OPTION:
+                try:
+                    sock.setsockopt(socket.IPPROTO_TCP, TCP_CORK_OPTION, 0)
+                except OSError:
+                    pass
+    except Exception as e:
+        log_stream_error(filename, e)
+
+@functools.lru_cache(maxsize=1024)
+def parse_range_header(range_header, file_size):
+    """Parse a single-range header into (byte_start, byte_end), or None if it isn't one"""
+    match = RANGE_PATTERN.match(range_header)
+    if not match:
+        return None
+    
+    start, end = match.groups()
+    if start:
+        if end and int(end) < int(start):
+            return None  # Syntactically invalid, so ignored rather than unsatisfiable
+        byte_end = min(int(end), file_size - 1) if end else file_size - 1
+        return int(start), byte_end
+    if end:
+        # Suffix range: the last N bytes of the file
+        return max(file_size - int(end), 0), file_size - 1
+    return None
+
+def handle_range_request(file_path, file_size, byte_range, mimetype, filename, etag):
+    """Handle HTTP range requests for partial content/resume downloads"""
+    byte_start, byte_end = byte_range
+    if byte_start >= file_size:
         return "❌ Range not satisfiable", 416
     
     content_length = byte_end - byte_start + 1
     
-    def stream_partial():
-        try:
-            with open(file_path, 'rb', buffering=ServerConfig.CHUNK_SIZE) as f:
-                f.seek(byte_start)
-                remaining = content_length
-                
-                while remaining > 0:
-                    chunk_size = min(ServerConfig.CHUNK_SIZE, remaining)
-                    chunk = f.read(chunk_size)
-                    if not chunk:
-                        break
-                    remaining -= len(chunk)
-                    yield chunk
-        except Exception as e:
-            print(f"❌ Range request error for {filename}: {e}")
-            return
+    body = file_body(file_path, byte_start, content_length, filename)
     
     response = Response(
-        stream_partial(),
+        body,
         206,  # Partial Content
         headers={
             'Content-Range': f'bytes {byte_start}-{byte_end}/{file_size}',
             'Accept-Ranges': 'bytes',
             'Content-Length': str(content_length),
             'Content-Type': mimetype,
-            'Content-Disposition': f'attachment; filename="{filename}"'
-        }
+            'Content-Disposition': content_disposition(filename),
+            'ETag': etag
+        },
+        direct_passthrough=True
     )
     return response
 
@@ -264,37 +908,88 @@ def handle_range_request(file_path, file_size, range_header, mimetype, filename)
 # FILE LISTING ROUTE - Professional UI
 # ============================================================================
 
+# orjson serializes large listings several times faster when it is installed
+try:
+    import orjson
+    json_dumps = orjson.dumps
+except ImportError:
+    def json_dumps(obj):
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+# One listing row; tuples are lighter than per-file dicts and the template reads attributes
+FileRow = collections.namedtuple('FileRow', 'name size modified raw_size')
+
+# Encoded listing bodies tagged with the metadata cache version they were built from
+listing_cache = {'html': (None, None, None, None), 'json': (None, None, None, None)}
+
 @app.route('/')
 def list_files():
     """Professional file listing with detailed information"""
     try:
-        files_info = []
-        total_size = 0
+        version, names, sizes, mtimes = file_cache.snapshot()
         
-        for filename in sorted(os.listdir(ServerConfig.SHARE_DIR)):
-            file_path = os.path.join(ServerConfig.SHARE_DIR, filename)
-            if os.path.isfile(file_path):
-                size = os.path.getsize(file_path)
-                total_size += size
-                
-                file_info = {
-                    'name': filename,
-                    'size': format_size(size),
-                    'raw_size': size,
-                    'modified': time.strftime('%Y-%m-%d %H:%M:%S', 
-                                            time.localtime(os.path.getmtime(file_path)))
-                }
-                
-                files_info.append(file_info)
+        if request.args.get('format') == 'json':
+            return list_files_json(version, names, sizes, mtimes)
+        
+        cached_version, html, html_gz, etag = listing_cache['html']
+        if cached_version == version:
+            return listing_response(html, html_gz, etag, 'text/html')
         
-        return generate_professional_ui(files_info, total_size)
+        # Timestamps are only formatted when the listing shows them
+        if ServerConfig.SHOW_FILE_DETAILS:
+            modified = map(format_mtime, map(int, mtimes))
+        else:
+            modified = [''] * len(names)
+        size_label = format_size
+        files_info = [
+            FileRow(filename, size_label(size), modified_label, size)
+            for filename, size, modified_label in zip(names, sizes, modified)
+        ]
+        total_size = sum(sizes)
+        
+        html = generate_professional_ui(files_info, total_size).encode('utf-8')
+        html_gz = gzip.compress(html, compresslevel=6)  # Once per directory change
+        etag = hashlib.blake2b(html, digest_size=8).hexdigest()
+        listing_cache['html'] = (version, html, html_gz, etag)
+        return listing_response(html, html_gz, etag, 'text/html')
             
     except Exception as e:
         return f"❌ Error listing files: {str(e)}", 500
 
-def generate_professional_ui(files_info, total_size):
-    """Professional HTML interface with full features"""
-    template = """
+def listing_response(body, body_gz, etag, mimetype):
+    """Return a cached listing, pre-gzipped when the client accepts it, or 304 if unchanged"""
+    # Tags hash the content rather than the snapshot version, which differs between worker processes
+    headers = {'Vary': 'Accept-Encoding'}
+    if request.accept_encodings['gzip']:
+        body, etag = body_gz, f'{etag}-gzip'
+        headers['Content-Encoding'] = 'gzip'
+    headers['ETag'] = f'"{etag}"'
+    
+    if request.if_none_match.contains(etag):
+        headers.pop('Content-Encoding', None)
+        return Response(status=304, headers=headers)
+    return Response(body, mimetype=mimetype, headers=headers)
+
+def list_files_json(version, names, sizes, mtimes):
+    """Machine-readable listing (GET /?format=json), serialized once per directory change"""
+    cached_version, body, body_gz, etag = listing_cache['json']
+    if cached_version != version:
+        body = json_dumps({
+            'file_count': len(names),
+            'total_size': sum(sizes),
+            'files': [
+                {'name': name, 'size': size, 'modified': mtime}
+                for name, size, mtime in zip(names, sizes, mtimes)
+            ]
+        })
+        body_gz = gzip.compress(body, compresslevel=6)
+        etag = hashlib.blake2b(body, digest_size=8).hexdigest()
+        listing_cache['json'] = (version, body, body_gz, etag)
+    
+    return listing_response(body, body_gz, etag, 'application/json')
+
+# Compiled once at import; rendering reuses the parsed template
+PROFESSIONAL_UI_TEMPLATE = """
     <!DOCTYPE html>
     <html lang="en">
     <head>
@@ -703,25 +1398,7 @@ def generate_professional_ui(files_info, total_size):
                         </tr>
                     </thead>
                     <tbody>
-                        {% for file in files_info %}
-                        <tr>
-                            <td>
-                                <div class="file-name">
-                                    <span class="file-icon">📄</span>
-                                    <a href="/{{ file.name }}" class="file-link" title="Click to download {{ file.name }}">
-                                        {{ file.name }}
-                                    </a>
-                                </div>
-                            </td>
-                            <td class="size-cell">{{ file.size }}</td>
-                            <td class="date-cell">{{ file.modified }}</td>
-                            <td style="text-align: center;">
-                                <a href="/{{ file.name }}" class="download-btn">
-                                    Download
-                                </a>
-                            </td>
-                        </tr>
-                        {% endfor %}
+                        {{ rows_html }}
                     </tbody>
                 </table>
                 {% else %}
@@ -743,14 +1420,48 @@ def generate_professional_ui(files_info, total_size):
     </body>
     </html>
     """
-    
-    return render_template_string(
-        template,
+# Compiled template code is kept on disk, so restarts skip parsing and compiling the page
+def make_template_env():
+    """Overlay of the app's Jinja environment that serves the listing page from a bytecode cache"""
+    # No directory argument: Jinja then uses its own per-user 0700 directory and checks
+    # its owner, since loading planted bytecode would run someone else's code
+    try:
+        bytecode_cache = FileSystemBytecodeCache()
+    except (OSError, RuntimeError):
+        bytecode_cache = None  # RuntimeError: no safe directory could be set up
+    return app.jinja_env.overlay(
+        loader=DictLoader({'listing.html': PROFESSIONAL_UI_TEMPLATE}),
+        bytecode_cache=bytecode_cache,
+        auto_reload=False
+    )
+
+PROFESSIONAL_UI = make_template_env().get_template('listing.html')
+
+# One table row per file, filled in with str.format instead of a Jinja loop
+FILE_ROW_HTML = (
+    '<tr><td><div class="file-name"><span class="file-icon">📄</span>'
+    '<a href="/{url}" class="file-link" title="Click to download {name}">{name}</a></div></td>'
+    '<td class="size-cell">{size}</td><td class="date-cell">{modified}</td>'
+    '<td style="text-align: center;"><a href="/{url}" class="download-btn">Download</a></td></tr>\n'
+)
+
+def render_file_rows(files_info):
+    """Pre-render the listing table body; names are escaped and URL-quoted here since the result is marked safe"""
+    row_html = FILE_ROW_HTML.format
+    return Markup(''.join([
+        row_html(name=escape(row.name), url=url_quote(row.name), size=row.size, modified=row.modified)
+        for row in files_info
+    ]))
+
+def generate_professional_ui(files_info, total_size):
+    """Professional HTML interface with full features"""
+    return PROFESSIONAL_UI.render(
         files_info=files_info,
+        rows_html=render_file_rows(files_info),
         file_count=len(files_info),
         total_size=format_size(total_size),
         chunk_size=format_size(ServerConfig.CHUNK_SIZE),
-        socket_buffer=format_size(ServerConfig.SOCKET_BUFFER_SIZE),
+        socket_buffer=socket_buffer_label(),
         max_file_size=f"{ServerConfig.MAX_FILE_SIZE_GB} GB"
     )
 
@@ -758,6 +1469,12 @@ def generate_professional_ui(files_info, total_size):
 # MAIN EXECUTION
 # ============================================================================
 
+def socket_buffer_label():
+    """Socket buffer setting as shown in the banner and the web UI"""
+    if ServerConfig.SOCKET_BUFFER_SIZE:
+        return format_size(ServerConfig.SOCKET_BUFFER_SIZE)
+    return "Auto (kernel)"
+
 def get_local_ip():
     """Get local IP address for LAN access"""
     try:
@@ -766,7 +1483,7 @@ def get_local_ip():
         ip = s.getsockname()[0]
         s.close()
         return ip
-    except:
+    except OSError:
         return "Unable to detect"
 
 def display_startup_info():
@@ -775,7 +1492,7 @@ def display_startup_info():
     print("📋 SERVER CONFIGURATION:")
     print("-" * 80)
     print(f"📦 Chunk Size:           {ServerConfig.CHUNK_SIZE_MB} MB")
-    print(f"🔧 Socket Buffer:        {ServerConfig.SOCKET_BUFFER_MB} MB")
+    print(f"🔧 Socket Buffer:        {socket_buffer_label()}")
     print(f"📊 Max File Size:        {ServerConfig.MAX_FILE_SIZE_GB} GB")
     print(f"⚡ Speed Mode:           MAXIMUM")
     print(f"♻️  Resume Downloads:    {'✅ Enabled' if ServerConfig.ENABLE_RANGE_REQUESTS else '❌ Disabled'}")
@@ -795,8 +1512,7 @@ def display_startup_info():
     print()
 
 def display_clarified_urls():
-    """Display clarified URLs after Flask starts"""
-    time.sleep(1.5)  # Wait for Flask to print its messages
+    """Display clarified URLs once the listening socket is bound"""
     local_ip = get_local_ip()
     
     print()
@@ -805,20 +1521,14 @@ def display_clarified_urls():
     if local_ip != "Unable to detect":
         print(f"   • http://{local_ip}:{ServerConfig.PORT} (for same wifi pc)")
     
-    # Wait for Cloudflare URL to be captured (up to 10 seconds)
-    wait_time = 0
-    max_wait = 10
-    while not ServerConfig.CLOUDFLARE_URL and wait_time < max_wait:
-        time.sleep(0.5)
-        wait_time += 0.5
-    
-    # Display Cloudflare URL if available
+    # The tunnel reader prints the Cloudflare URL itself once cloudflared reports it
     if ServerConfig.CLOUDFLARE_URL:
         print(f"   • {ServerConfig.CLOUDFLARE_URL} (for global share)")
-    else:
-        print("   • Cloudflare Tunnel starting... (check separate window for URL)")
+    elif ServerConfig.CLOUDFLARE_PROCESS:
+        print("   • Cloudflare Tunnel starting... (URL will be shown below)")
     
     print()
+    sys.stdout.flush()  # Forked workers must not inherit and repeat buffered output
 
 def find_cloudflared():
     """Find cloudflared.exe on the system or in bundled resources"""
@@ -852,7 +1562,7 @@ def find_cloudflared():
                               timeout=5)
         if result.returncode == 0 and result.stdout.strip():
             return result.stdout.strip().split('\n')[0]
-    except:
+    except (OSError, subprocess.SubprocessError):
         pass
     
     return None
@@ -895,8 +1605,6 @@ def start_cloudflare_tunnel():
         ServerConfig.CLOUDFLARE_PROCESS = process
         
         # Read output asynchronously to capture URL without blocking tunnel performance
-        import threading
-        
         def read_tunnel_output():
             url_pattern = re.compile(r'https://[a-z0-9-]+\.trycloudflare\.com')
             try:
@@ -920,7 +1628,7 @@ def start_cloudflare_tunnel():
                             subprocess.run(['clip'], input=ServerConfig.CLOUDFLARE_URL, 
                                          text=True, check=True, timeout=2)
                             print("📋 URL copied to clipboard!")
-                        except:
+                        except (OSError, subprocess.SubprocessError):
                             pass
                         break
                     
@@ -942,10 +1650,10 @@ def stop_cloudflare_tunnel():
         try:
             ServerConfig.CLOUDFLARE_PROCESS.terminate()
             ServerConfig.CLOUDFLARE_PROCESS.wait(timeout=5)
-        except:
+        except (OSError, subprocess.TimeoutExpired):
             try:
                 ServerConfig.CLOUDFLARE_PROCESS.kill()
-            except:
+            except OSError:
                 pass
 
 def kill_existing_cloudflared_processes():
@@ -955,32 +1663,118 @@ def kill_existing_cloudflared_processes():
             # Use taskkill on Windows to terminate any existing cloudflared processes
             result = subprocess.run(['taskkill', '/F', '/IM', 'cloudflared.exe'], 
                          capture_output=True, text=True, timeout=10)
-            # Also kill any processes listening on the port we want to use
-            try:
-                subprocess.run(['netstat', '-ano'], capture_output=True, text=True, timeout=5)
-            except:
-                pass
         else:
             # Use pkill on Unix-like systems
-            subprocess.run(['pkill', '-f', 'cloudflared'], 
+            result = subprocess.run(['pkill', '-f', 'cloudflared'], 
                          capture_output=True, text=True, timeout=10)
         
-        # Wait a moment for processes to fully terminate
-        time.sleep(2)
+        # Give killed processes a moment to release the tunnel; both tools
+        # exit non-zero when nothing matched, so a clean start doesn't wait
+        if result.returncode == 0:
+            time.sleep(2)
         
     except Exception as e:
         if ServerConfig.DEBUG_MODE:
             print(f"⚠️  Note: Could not check for existing cloudflared processes: {e}")
         pass
 
+# PIDs of forked SO_REUSEPORT workers, terminated on exit
+worker_pids = []
+
+def run_with_waitress():
+    """Serve with waitress: one event loop for socket I/O plus a fixed worker pool"""
+    try:
+        from waitress import serve
+    except ImportError:
+        print("⚠️  waitress not installed (pip install waitress) - using Flask development server")
+        return False
+    
+    # Separate processes sidestep the GIL; SO_REUSEPORT lets the kernel spread
+    # accepted connections across them. Windows has neither, so it stays threaded.
+    can_fork = hasattr(os, 'fork') and hasattr(socket, 'SO_REUSEPORT')
+    workers = max(1, ServerConfig.WORKER_PROCESSES) if can_fork else 1
+    
+    # Bind in the parent first so a busy port fails before any worker is forked
+    listen_sock = bind_listen_socket(reuse_port=workers > 1)
+    display_clarified_urls()
+    
+    if workers > 1:
+        # SIGTERM (service stop) must unwind through atexit so the workers are reaped too
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    
+    for _ in range(workers - 1):
+        pid = os.fork()
+        if pid == 0:
+            # Workers must never run the parent's atexit tunnel cleanup
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                listen_sock.close()
+                serve_waitress(serve, bind_listen_socket(reuse_port=True))
+            except KeyboardInterrupt:
+                pass
+            finally:
+                os._exit(0)
+        worker_pids.append(pid)
+    
+    serve_waitress(serve, listen_sock)
+    return True
+
+def run_with_werkzeug():
+    """Serve with Werkzeug's threaded development server and the optimized request handler"""
+    server = make_server(
+        ServerConfig.HOST,
+        ServerConfig.PORT,
+        app,
+        threaded=ServerConfig.ENABLE_THREADING,
+        request_handler=OptimizedRequestHandler
+    )
+    display_clarified_urls()
+    start_share_watcher()
+    server.serve_forever()
+
+def bind_listen_socket(reuse_port=False):
+    """Create and bind the listening socket, applying any explicit buffer size"""
+    # Buffer sizes set on the listening socket are inherited by accepted connections
+    listen_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    if sys.platform != 'win32':
+        listen_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        listen_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    if ServerConfig.SOCKET_BUFFER_SIZE:
+        listen_sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, ServerConfig.SOCKET_BUFFER_SIZE)
+        listen_sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, ServerConfig.SOCKET_BUFFER_SIZE)
+    listen_sock.bind((ServerConfig.HOST, ServerConfig.PORT))
+    return listen_sock
+
+def serve_waitress(serve, listen_sock):
+    """Run waitress on an already bound socket until interrupted"""
+    start_share_watcher()  # Threads don't survive fork, so each worker starts its own
+    serve(
+        app,
+        sockets=[listen_sock],
+        threads=ServerConfig.WORKER_THREADS,
+        ident='HighPerformanceFileServer'
+    )
+
+def stop_worker_processes():
+    """Terminate forked SO_REUSEPORT workers"""
+    for pid in worker_pids:
+        try:
+            os.kill(pid, signal.SIGTERM)
+            os.waitpid(pid, 0)
+        except OSError:
+            pass
+    worker_pids.clear()
+
 def cleanup_on_exit():
     """Enhanced cleanup function for application exit"""
     try:
-        # Stop current process if it exists
+        # Stop server workers and the current tunnel process if they exist
+        stop_worker_processes()
         stop_cloudflare_tunnel()
         # Kill any remaining cloudflared processes
         kill_existing_cloudflared_processes()
-    except:
+    except Exception:
         pass
 
 def main():
@@ -990,7 +1784,7 @@ def main():
         kill_existing_cloudflared_processes()
         
         # STEP 2: Get user configuration
-        get_user_configuration()
+        get_user_configuration(parse_arguments())
         
         # STEP 3: Display configuration
         display_startup_info()
@@ -1002,19 +1796,10 @@ def main():
         print("🚀 Starting high-performance file server...")
         print()
         
-        # Start a thread to display clarified URLs after Flask starts
-        import threading
-        url_thread = threading.Thread(target=display_clarified_urls, daemon=True)
-        url_thread.start()
-        
-        # Start Flask server
-        app.run(
-            host=ServerConfig.HOST,
-            port=ServerConfig.PORT,
-            threaded=ServerConfig.ENABLE_THREADING,
-            debug=ServerConfig.DEBUG_MODE,
-            request_handler=OptimizedRequestHandler
-        )
+        # Start production server, falling back to the Flask development server;
+        # each prints the access URLs as soon as its socket is bound
+        if not run_with_waitress():
+            run_with_werkzeug()
         
     except KeyboardInterrupt:
         print("\n\n🛑 Server stopped by user")
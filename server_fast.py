@@ -4,77 +4,182 @@ This version focuses on the fastest possible downloads
 """
 
 from flask import Flask, Response, request
+from markupsafe import escape
+from werkzeug.http import dump_options_header, is_resource_modified
+from werkzeug.wsgi import wrap_file
+from urllib.parse import quote
+from email.utils import formatdate
 import os
+import re
+import signal
+import socket
+import stat
+import sys
+import functools
 import mimetypes
 import time
+import unicodedata
 
 app = Flask(__name__)
 SHARE_DIR = r"D:/server/index"
 
 # Maximum performance settings
 CHUNK_SIZE = 8 * 1024 * 1024  # 8MB chunks for maximum throughput
+WORKER_PROCESSES = os.cpu_count() or 1  # SO_REUSEPORT server processes under waitress (POSIX only)
+HAS_SENDFILE = hasattr(os, 'sendfile')  # Zero-copy sends (POSIX only)
+HAS_FADVISE = hasattr(os, 'posix_fadvise')  # Page-cache hints (POSIX only)
+READAHEAD_WINDOW = 64 * 1024 * 1024     # Prefetch at most this much up front
+DROP_CACHE_THRESHOLD = 1024 ** 3        # Evict one-shot regions at least this large after sending
+DOWNLOAD_HEADERS = (('Accept-Ranges', 'bytes'), ('Cache-Control', 'public, max-age=3600'))  # Same on every download
+UNSAFE_PATH_PATTERN = re.compile(  # '..' segments, NUL bytes, absolute paths (and drives on Windows)
+    r'(^|[/\\])\.\.([/\\]|$)|\x00|^[/\\]' + (r'|:' if sys.platform == 'win32' else '')
+)
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')  # Single range; either bound may be empty
+
+# Short-lived caches so hot files and the listing skip repeated syscalls
+STAT_TTL = 2.0       # Seconds a stat() result is reused
+LISTING_TTL = 1.0    # Seconds the rendered listing is reused while SHARE_DIR is unchanged
+stat_cache = {}
+listing_cache = {'ts': 0.0, 'dir_mtime': None, 'html': None}
+
+def cached_stat(path):
+    """os.stat() result reused for STAT_TTL seconds; raises OSError like os.stat"""
+    now = time.monotonic()
+    hit = stat_cache.get(path)
+    if hit and now - hit[0] < STAT_TTL:
+        return hit[1]
+    st = os.stat(path)
+    if len(stat_cache) > 4096:
+        stat_cache.clear()  # Bound memory when many distinct files are requested
+    stat_cache[path] = (now, st)
+    return st
+
+@functools.lru_cache(maxsize=8)
+def share_prefix(share_dir):
+    """Absolute share directory with a trailing separator, computed once per SHARE_DIR"""
+    return os.path.join(os.path.abspath(share_dir), '')
+
+# Load the MIME database at startup rather than inside the first download
+mimetypes.init()
+
+@functools.lru_cache(maxsize=256)
+def mimetype_for_extension(ext):
+    """Content-Type for a lowercase extension: one dict lookup once seen"""
+    return mimetypes.types_map.get(ext) or mimetypes.guess_type('x' + ext)[0] or 'application/octet-stream'
+
+@functools.lru_cache(maxsize=4096)
+def http_date(seconds):
+    """Last-Modified value for a whole-second mtime, formatted once per mtime"""
+    return formatdate(seconds, usegmt=True)
+
+def guess_mimetype(filename):
+    """Content-Type for a file name, cached per extension rather than per name"""
+    return mimetype_for_extension(os.path.splitext(filename)[1].lower())
+
+@functools.lru_cache(maxsize=4096)
+def content_disposition(filename):
+    """Attachment header that survives quotes and non-ASCII characters in the name"""
+    try:
+        filename.encode('ascii')
+    except UnicodeEncodeError:
+        fallback = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        return dump_options_header('attachment', {
+            'filename': fallback,
+            'filename*': "UTF-8''" + quote(filename, safe="!#$&+^`|~")
+        })
+    return dump_options_header('attachment', {'filename': filename})
 
 @app.route('/<path:filename>')
 def download_file(filename):
     """Ultra-fast file download with maximum optimization"""
-    file_path = os.path.join(SHARE_DIR, filename)
+    # Traversal attempts are refused by a string scan; normalization is the backstop
+    if UNSAFE_PATH_PATTERN.search(filename):
+        return "Access denied", 403
+    share = share_prefix(SHARE_DIR)
+    file_path = os.path.normpath(os.path.join(share, filename))
+    if not file_path.startswith(share):
+        return "Access denied", 403
     
-    if not os.path.exists(file_path):
+    try:
+        st = cached_stat(file_path)
+    except OSError:
         return "File not found", 404
+    if not stat.S_ISREG(st.st_mode):
+        return "File not found", 404
+    
+    file_size = st.st_size
+    etag = f'{file_size:x}-{st.st_mtime_ns:x}'
+    last_modified = http_date(int(st.st_mtime))
+    validators = [('ETag', f'"{etag}"'), ('Last-Modified', last_modified)]
     
-    file_size = os.path.getsize(file_path)
-    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    # Revalidating clients get a bodiless 304 and the file is never opened
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return Response(status=304, headers=validators)
     
-    # Handle range requests for resume capability
+    mimetype = guess_mimetype(filename)
+    headers = [
+        *DOWNLOAD_HEADERS,
+        ('Content-Length', str(file_size)),
+        ('Content-Type', mimetype),
+        ('Content-Disposition', content_disposition(filename)),
+        *validators
+    ]
+    
+    # HEAD (download managers probing size before range requests) needs only the stat result
+    if request.method == 'HEAD':
+        return Response(headers=headers)
+    
+    # Handle range requests for resume capability, unless If-Range says the file changed.
+    # Multi-range, other units and malformed headers are ignored: the whole file is sent
     range_header = request.headers.get('Range')
-    if range_header:
-        return handle_range_request(file_path, file_size, range_header, mimetype, filename)
-    
-    # Full file download with maximum speed streaming
-    def stream_file():
-        with open(file_path, 'rb', buffering=CHUNK_SIZE) as f:
-            while True:
-                chunk = f.read(CHUNK_SIZE)
-                if not chunk:
-                    break
-                yield chunk
+    if_range = request.headers.get('If-Range')
+    if range_header and (if_range is None or if_range == f'"{etag}"' or if_range == last_modified):
+        byte_range = parse_range(range_header, file_size)
+        if byte_range:
+            return handle_range_request(file_path, file_size, byte_range, mimetype, filename, validators)
     
-    return Response(
-        stream_file(),
-        headers={
-            'Content-Length': str(file_size),
-            'Content-Type': mimetype,
-            'Accept-Ranges': 'bytes',
-            'Content-Disposition': f'attachment; filename="{filename}"',
-            'Cache-Control': 'public, max-age=3600'
-        }
-    )
+    # Full file download with maximum speed streaming: sendfile() under the
+    # Werkzeug server, otherwise the server's wsgi.file_wrapper (waitress
+    # streams straight from the file instead of buffering 8MB chunks)
+    sock = request.environ.get('werkzeug.socket') if HAS_SENDFILE else None
+    if sock:
+        body = sendfile_region(sock, file_path, 0, file_size)
+    else:
+        body = wrap_file(request.environ, open_region(file_path, 0, file_size), CHUNK_SIZE)
+    
+    return Response(body, direct_passthrough=True, headers=headers)
 
-def handle_range_request(file_path, file_size, range_header, mimetype, filename):
-    """Handle partial downloads for resume support"""
-    byte_start = 0
-    byte_end = file_size - 1
+@functools.lru_cache(maxsize=1024)
+def parse_range(range_header, file_size):
+    """(start, end) of a single byte range, or None if the header isn't one valid range"""
+    match = RANGE_PATTERN.match(range_header)
+    if not match:
+        return None
     
-    if range_header.startswith('bytes='):
-        try:
-            range_spec = range_header[6:].split(',')[0]
-            if '-' in range_spec:
-                start, end = range_spec.split('-', 1)
-                if start:
-                    byte_start = int(start)
-                if end:
-                    byte_end = min(int(end), file_size - 1)
-        except:
-            return "Invalid range", 400
-    
-    if byte_start >= file_size or byte_end < byte_start:
+    start, end = match.groups()
+    if start:
+        byte_start = int(start)
+        if end and int(end) < byte_start:
+            return None  # Syntactically invalid, so ignored rather than unsatisfiable
+        byte_end = min(int(end), file_size - 1) if end else file_size - 1
+    elif end:
+        # Suffix range: the last N bytes
+        byte_start = max(file_size - int(end), 0)
+        byte_end = file_size - 1
+    else:
+        return None
+    return byte_start, byte_end
+
+def handle_range_request(file_path, file_size, byte_range, mimetype, filename, validators):
+    """Handle partial downloads for resume support"""
+    byte_start, byte_end = byte_range
+    if byte_start >= file_size:
         return "Range not satisfiable", 416
     
     content_length = byte_end - byte_start + 1
     
     def stream_partial():
-        with open(file_path, 'rb', buffering=CHUNK_SIZE) as f:
-            f.seek(byte_start)
+        with open_region(file_path, byte_start, content_length) as f:
             remaining = content_length
             while remaining > 0:
                 chunk_size = min(CHUNK_SIZE, remaining)
@@ -83,29 +188,85 @@ def handle_range_request(file_path, file_size, range_header, mimetype, filename)
                     break
                 remaining -= len(chunk)
                 yield chunk
+            drop_region(f.fileno(), byte_start, content_length)
+    
+    sock = request.environ.get('werkzeug.socket') if HAS_SENDFILE else None
+    if sock:
+        body = sendfile_region(sock, file_path, byte_start, content_length)
+    elif 'wsgi.file_wrapper' in request.environ:
+        # waitress/gunicorn start at the file position and stop at Content-Length
+        body = wrap_file(request.environ, open_region(file_path, byte_start, content_length), CHUNK_SIZE)
+    else:
+        body = stream_partial()
     
     return Response(
-        stream_partial(),
+        body,
         206,
-        headers={
-            'Content-Range': f'bytes {byte_start}-{byte_end}/{file_size}',
-            'Accept-Ranges': 'bytes',
-            'Content-Length': str(content_length),
-            'Content-Type': mimetype,
-            'Content-Disposition': f'attachment; filename="{filename}"'
-        }
+        direct_passthrough=True,
+        headers=[
+            *DOWNLOAD_HEADERS,
+            ('Content-Range', f'bytes {byte_start}-{byte_end}/{file_size}'),
+            ('Content-Length', str(content_length)),
+            ('Content-Type', mimetype),
+            ('Content-Disposition', content_disposition(filename)),
+            *validators
+        ]
     )
 
+def open_region(file_path, offset, count):
+    """Open a file unbuffered at offset and ask the kernel to read the region ahead"""
+    f = open(file_path, 'rb', buffering=0)
+    if offset:
+        f.seek(offset)
+    if HAS_FADVISE and count:
+        try:
+            os.posix_fadvise(f.fileno(), offset, count, os.POSIX_FADV_SEQUENTIAL)
+            os.posix_fadvise(f.fileno(), offset, min(count, READAHEAD_WINDOW), os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass
+    return f
+
+def drop_region(fd, offset, count):
+    """Release a large region from the page cache once it has been sent"""
+    if HAS_FADVISE and count >= DROP_CACHE_THRESHOLD:
+        try:
+            os.posix_fadvise(fd, offset, count, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass
+
+def sendfile_region(sock, file_path, offset, count):
+    """Copy a file region to the client socket in the kernel with sendfile(2)"""
+    with open_region(file_path, offset, count) as f:
+        # Empty chunk makes the server send the status line and headers first
+        yield b''
+        out_fd, in_fd = sock.fileno(), f.fileno()
+        start, total = offset, count
+        while count > 0:
+            sent = os.sendfile(out_fd, in_fd, offset, count)
+            if not sent:
+                break  # File shrank while sending
+            offset += sent
+            count -= sent
+        drop_region(in_fd, start, total)
+
 @app.route('/')
 def list_files():
     """Simple file listing"""
-    files = []
-    for f in sorted(os.listdir(SHARE_DIR)):
-        if os.path.isfile(os.path.join(SHARE_DIR, f)):
-            size = os.path.getsize(os.path.join(SHARE_DIR, f))
-            files.append(f'<p><a href="/{f}" style="font-size:18px">{f}</a> ({format_size(size)})</p>')
+    dir_mtime = os.stat(SHARE_DIR).st_mtime
+    if (listing_cache['html'] is not None and listing_cache['dir_mtime'] == dir_mtime
+            and time.monotonic() - listing_cache['ts'] < LISTING_TTL):
+        return Response(listing_cache['html'], mimetype='text/html')
     
-    return f"""
+    # One scandir pass: entries carry their type, so only files are stat()ed, once each
+    with os.scandir(SHARE_DIR) as it:
+        entries = sorted((entry for entry in it if entry.is_file()), key=lambda entry: entry.name)
+    files = [
+        f'<p><a href="/{quote(entry.name)}" style="font-size:18px">{escape(entry.name)}</a> '
+        f'({format_size(entry.stat().st_size)})</p>'
+        for entry in entries
+    ]
+    
+    html = f"""
     <html><head><title>Speed-Optimized File Server</title></head>
     <body style="font-family: Arial; margin: 40px;">
     <h1>🚀 High-Speed Downloads</h1>
@@ -114,14 +275,81 @@ def list_files():
     <hr>
     {''.join(files)}
     </body></html>
-    """
+    """.encode('utf-8')  # Encoded once here, not by Flask on every cached hit
+    listing_cache.update(ts=time.monotonic(), dir_mtime=dir_mtime, html=html)
+    return Response(html, mimetype='text/html')
+
+SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB', 'PB')
+
+@functools.lru_cache(maxsize=4096)
+def format_size(size):
+    """Human readable size; the bit length picks the unit, no division loop"""
+    i = min((size.bit_length() - 1) // 10, len(SIZE_UNITS) - 1) if size else 0
+    return f"{size / (1 << (10 * i)):.1f} {SIZE_UNITS[i]}"
 
-def format_size(bytes):
-    for unit in ['B', 'KB', 'MB', 'GB']:
-        if bytes < 1024:
-            return f"{bytes:.1f} {unit}"
-        bytes /= 1024
-    return f"{bytes:.1f} TB"
+def run_with_waitress():
+    """Serve with waitress: HTTP/1.1 keep-alive, a fixed thread pool and one process per core"""
+    try:
+        from waitress import serve
+    except ImportError:
+        print("⚠️ waitress not installed (pip install waitress) - using Flask development server")
+        return False
+    
+    # SO_REUSEPORT lets the kernel spread new connections across forked workers,
+    # each with its own GIL and caches. Windows has neither, so it stays threaded.
+    can_fork = hasattr(os, 'fork') and hasattr(socket, 'SO_REUSEPORT')
+    workers = WORKER_PROCESSES if can_fork else 1
+    
+    # Bind in the parent first so a busy port fails before any worker is forked
+    listen_sock = bind_listen_socket(reuse_port=workers > 1)
+    if workers > 1:
+        print(f"👥 Workers: {workers} processes sharing port 8000")
+        # SIGTERM must unwind through the finally below so the workers are reaped too
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    
+    worker_pids = []
+    try:
+        for _ in range(workers - 1):
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                    listen_sock.close()
+                    serve_waitress(serve, bind_listen_socket(reuse_port=True))
+                except KeyboardInterrupt:
+                    pass
+                finally:
+                    os._exit(0)
+            worker_pids.append(pid)
+        
+        serve_waitress(serve, listen_sock)
+    finally:
+        for pid in worker_pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+            except OSError:
+                pass
+    return True
+
+def bind_listen_socket(reuse_port=False):
+    """Bind the listening socket on port 8000, optionally shared with other workers"""
+    listen_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    if sys.platform != 'win32':
+        listen_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        listen_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    listen_sock.bind(('0.0.0.0', 8000))
+    return listen_sock
+
+def serve_waitress(serve, listen_sock):
+    """Run waitress on an already bound socket until interrupted"""
+    serve(
+        app,
+        sockets=[listen_sock],
+        threads=32,
+        connection_limit=1000
+    )
 
 if __name__ == "__main__":
     print("🚀 Starting SPEED-OPTIMIZED File Server")
@@ -135,4 +363,6 @@ if __name__ == "__main__":
     print("• Streaming file transfer (no memory limits)")
     print("• Optimized file I/O buffering")
     
-    app.run(host='0.0.0.0', port=8000, threaded=True, debug=False)
\ No newline at end of file
+    # The Werkzeug dev server closes every connection; waitress keeps them open
+    if not run_with_waitress():
+        app.run(host='0.0.0.0', port=8000, threaded=True, debug=False)
\ No newline at end of file
@@ -1,9 +1,30 @@
-from flask import Flask, Response, request, render_template_string
+from flask import Flask, Response, request
+from werkzeug.wsgi import wrap_file
+from werkzeug.http import is_resource_modified, dump_options_header
+from email.utils import formatdate
+from urllib.parse import quote
 import os
+import re
+import stat
+import unicodedata
 import mimetypes
+import functools
 from werkzeug.serving import WSGIRequestHandler
 import threading
+from concurrent.futures import ThreadPoolExecutor
 import time
+import gzip
+import hashlib
+import collections
+from datetime import datetime
+import socket
+import sys
+
+# Brotli shrinks the listing page further when it is installed
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 app = Flask(__name__)
 SHARE_DIR = r"D:/server/index"
@@ -11,218 +32,316 @@ SHARE_DIR = r"D:/server/index"
 # Optimized settings
 BUFFER_SIZE = 2 * 1024 * 1024  # 2MB chunks for better performance
 MAX_CONTENT_LENGTH = 16 * 1024 * 1024 * 1024  # 16GB max file size
+HAS_SENDFILE = hasattr(os, 'sendfile')  # Zero-copy sends (POSIX only)
+HAS_PREAD = hasattr(os, 'pread')  # Positional reads (not on Windows)
+HAS_FADVISE = hasattr(os, 'posix_fadvise')  # Page-cache hints (POSIX only)
+READAHEAD_WINDOW = 64 * 1024 * 1024     # Prefetch at most this much when a download starts
+DROP_CACHE_THRESHOLD = 1024 ** 3        # Evict regions at least this large once they are sent
+UNSAFE_PATH_PATTERN = re.compile(  # '..' segments, NUL bytes, absolute paths (and drives on Windows)
+    r'(^|[/\\])\.\.([/\\]|$)|\x00|^[/\\]' + (r'|:' if sys.platform == 'win32' else '')
+)
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')  # Single range; either bound may be empty
+
+# Requests per file since the last prefetch pass; the most popular files get
+# their leading bytes pulled back into the page cache in the background
+PREFETCH_INTERVAL = 60  # Seconds between prefetch passes
+PREFETCH_FILES = 16
+hit_counter = collections.Counter()
+hit_lock = threading.Lock()  # Request threads count while the prefetch thread swaps the Counter out
+prefetch_pid = None  # Process running the prefetch thread; threads don't survive fork
+prefetch_lock = threading.Lock()
+
+# Holds back partial segments so the headers share a packet with the first file bytes
+TCP_CORK_OPTION = getattr(socket, 'TCP_CORK', None) or getattr(socket, 'TCP_NOPUSH', None)
+NOTSENT_LOWAT = 128 * 1024  # Cap on unsent bytes queued per connection (Linux/macOS)
+
+# Header pairs shared by every download response, built once
+CACHE_HEADER = ('Cache-Control', 'public, max-age=3600')  # Cache for 1 hour
+ACCEPT_RANGES_HEADER = ('Accept-Ranges', 'bytes')
 
 class OptimizedRequestHandler(WSGIRequestHandler):
     """Custom request handler with optimized settings"""
     def setup(self):
         super().setup()
-        # Increase socket buffer sizes
+        # Socket buffers are left to kernel autotuning; fixed sizes disable it on Linux
+        # Disable Nagle so chunk boundaries don't wait on delayed ACKs (40 ms stalls)
         try:
-            self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1024 * 1024)
-            self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1024 * 1024)
-        except:
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            # Slow clients can't pin megabytes of queued data in kernel memory each
+            if hasattr(socket, 'TCP_NOTSENT_LOWAT'):
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NOTSENT_LOWAT, NOTSENT_LOWAT)
+        except OSError:
             pass
 
+# Read the system MIME tables while importing, so no worker's first download pays for it
+mimetypes.init()
+
+@functools.lru_cache(maxsize=256)
+def mimetype_for_extension(ext):
+    """Content-Type for a lowercase extension, memoized across requests"""
+    return mimetypes.types_map.get(ext) or mimetypes.guess_type('x' + ext)[0] or 'application/octet-stream'
+
+@functools.lru_cache(maxsize=8)
+def share_prefix(share_dir):
+    """Absolute share directory with a trailing separator, for containment checks"""
+    return os.path.join(os.path.abspath(share_dir), '')
+
+@functools.lru_cache(maxsize=4096)
+def content_disposition(filename):
+    """Content-Disposition for a download, with an RFC 5987 filename* for non-ASCII names"""
+    try:
+        filename.encode('ascii')
+    except UnicodeEncodeError:
+        fallback = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        return dump_options_header('attachment', {
+            'filename': fallback,
+            'filename*': "UTF-8''" + quote(filename, safe="!#$&+^`|~")
+        })
+    return dump_options_header('attachment', {'filename': filename})
+
+@functools.lru_cache(maxsize=4096)
+def http_date(seconds):
+    """Last-Modified for a whole-second mtime; hot files reuse the formatted string"""
+    return formatdate(seconds, usegmt=True)
+
+def guess_mimetype(filename):
+    """Content-Type for a file name, cached per extension"""
+    return mimetype_for_extension(os.path.splitext(filename)[1].lower())
+
 @app.route('/<path:filename>')
 def download_file(filename):
     """Optimized file download with range support and streaming"""
-    file_path = os.path.join(SHARE_DIR, filename)
+    # Traversal attempts are refused by a string scan before any path arithmetic
+    if UNSAFE_PATH_PATTERN.search(filename):
+        return "Access denied", 403
+    
+    # Normalize once and refuse anything outside the share before touching the disk
+    share = share_prefix(SHARE_DIR)
+    file_path = os.path.normpath(os.path.join(share, filename))
+    if not file_path.startswith(share):
+        return "Access denied", 403
     
-    if not os.path.exists(file_path) or not os.path.isfile(file_path):
+    # One stat() answers existence, file type, size and mtime
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return "File not found", 404
+    if not stat.S_ISREG(st.st_mode):
         return "File not found", 404
     
-    # Security check - prevent directory traversal
-    if not os.path.abspath(file_path).startswith(os.path.abspath(SHARE_DIR)):
-        return "Access denied", 403
+    if HAS_FADVISE:
+        with hit_lock:
+            hit_counter[file_path] += 1
+        if prefetch_pid != os.getpid():
+            start_prefetcher()
     
-    file_size = os.path.getsize(file_path)
-    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    file_size = st.st_size
+    mimetype = guess_mimetype(filename)
+    etag = f'{st.st_size:x}-{st.st_mtime_ns:x}'
+    last_modified = http_date(int(st.st_mtime))
     
-    # Handle range requests (crucial for large files and resume support)
-    range_header = request.headers.get('Range', None)
-    if range_header:
-        return handle_range_request(file_path, file_size, range_header, mimetype, filename)
+    validators = [('ETag', f'"{etag}"'), ('Last-Modified', last_modified), CACHE_HEADER]
     
-    # Full file download with optimized streaming
-    def generate_file():
-        try:
-            with open(file_path, 'rb', buffering=BUFFER_SIZE) as f:
-                while True:
-                    chunk = f.read(BUFFER_SIZE)
-                    if not chunk:
-                        break
-                    yield chunk
-        except Exception as e:
-            print(f"Error reading file: {e}")
-            return
+    # Client already has this version: answer 304 without opening the file
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return Response(status=304, headers=validators)
     
-    response = Response(
-        generate_file(),
-        headers={
-            'Content-Length': str(file_size),
-            'Content-Type': mimetype,
-            'Accept-Ranges': 'bytes',
-            'Content-Disposition': f'attachment; filename="{filename}"',
-            'Cache-Control': 'public, max-age=3600',  # Cache for 1 hour
-            'Last-Modified': time.strftime('%a, %d %b %Y %H:%M:%S GMT', 
-                            time.gmtime(os.path.getmtime(file_path)))
-        }
-    )
-    return response
-
-def handle_range_request(file_path, file_size, range_header, mimetype, filename):
-    """Handle HTTP range requests for partial content"""
-    byte_start = 0
-    byte_end = file_size - 1
+    file_headers = [('Content-Type', mimetype), ('Content-Disposition', content_disposition(filename)), *validators]
+    headers = [ACCEPT_RANGES_HEADER, ('Content-Length', str(file_size)), *file_headers]
+    
+    # HEAD (players probing Content-Length before range requests) needs only the stat result
+    if request.method == 'HEAD':
+        return Response(headers=headers)
+    
+    # Resumes and seeks send a single range. Multi-range and malformed headers are
+    # ignored, as is any Range whose If-Range names an older version: full file, 200
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if range_header and file_size and (if_range is None or if_range == f'"{etag}"' or if_range == last_modified):
+        byte_range = parse_range(range_header, file_size)
+        if byte_range and byte_range[0] >= file_size:
+            return Response("Range not satisfiable", 416, headers=[('Content-Range', f'bytes */{file_size}')])
+        if byte_range:
+            return partial_response(file_path, file_size, byte_range, file_headers)
     
+    # The Werkzeug server has no wsgi.file_wrapper, so whole-file downloads
+    # go straight from the page cache to its socket with sendfile()
+    sock = request.environ.get('werkzeug.socket') if HAS_SENDFILE else None
+    if sock and 'wsgi.file_wrapper' not in request.environ:
+        return Response(sendfile_region(sock, file_path, 0, file_size),
+                        direct_passthrough=True, headers=headers)
+    
+    # Hand the open file to the server's wsgi.file_wrapper (sendfile() under gunicorn)
     try:
-        # Parse range header (format: bytes=start-end)
-        if range_header.startswith('bytes='):
-            range_spec = range_header[6:]
-            ranges = range_spec.split(',')[0]  # Handle only first range
-            
-            if '-' in ranges:
-                start, end = ranges.split('-', 1)
-                if start:
-                    byte_start = int(start)
-                if end:
-                    byte_end = min(int(end), file_size - 1)
-    except ValueError:
-        return "Invalid range", 400
+        f = open(file_path, 'rb')
+    except OSError:
+        return "File not found", 404
+    advise_sequential(f.fileno(), 0, file_size)
     
-    # Validate range
-    if byte_start < 0 or byte_start >= file_size or byte_end < byte_start:
-        return "Range not satisfiable", 416
+    return Response(wrap_file(request.environ, f, BUFFER_SIZE), direct_passthrough=True, headers=headers)
+
+@functools.lru_cache(maxsize=1024)
+def parse_range(range_header, file_size):
+    """(start, end) of a single byte range, or None if the header isn't one valid range"""
+    match = RANGE_PATTERN.match(range_header)
+    if not match:
+        return None
     
+    start, end = match.groups()
+    if start:
+        byte_start = int(start)
+        if end and int(end) < byte_start:
+            return None  # Syntactically invalid, so ignored rather than unsatisfiable
+        byte_end = min(int(end), file_size - 1) if end else file_size - 1
+    elif end:
+        # Suffix range: the last N bytes ("-0" leaves start at file_size: unsatisfiable)
+        byte_start = max(file_size - int(end), 0)
+        byte_end = file_size - 1
+    else:
+        return None
+    return byte_start, byte_end
+
+def partial_response(file_path, file_size, byte_range, file_headers):
+    """206 response for one byte range of the file"""
+    byte_start, byte_end = byte_range
     content_length = byte_end - byte_start + 1
     
-    def generate_partial():
+    if 'wsgi.file_wrapper' in request.environ:
+        # Gunicorn and waitress send from the current position up to Content-Length
         try:
-            with open(file_path, 'rb', buffering=BUFFER_SIZE) as f:
-                f.seek(byte_start)
-                remaining = content_length
-                
-                while remaining > 0:
-                    chunk_size = min(BUFFER_SIZE, remaining)
-                    chunk = f.read(chunk_size)
-                    if not chunk:
-                        break
-                    remaining -= len(chunk)
-                    yield chunk
-        except Exception as e:
-            print(f"Error reading partial file: {e}")
-            return
+            f = open(file_path, 'rb')
+        except OSError:
+            return "File not found", 404
+        f.seek(byte_start)
+        advise_sequential(f.fileno(), byte_start, content_length)
+        body = wrap_file(request.environ, f, BUFFER_SIZE)
+    elif HAS_SENDFILE and 'werkzeug.socket' in request.environ:
+        # sendfile() takes the offset itself: no seek, no copy through Python
+        body = sendfile_region(request.environ['werkzeug.socket'], file_path, byte_start, content_length)
+    else:
+        body = read_region(file_path, byte_start, content_length)
     
-    response = Response(
-        generate_partial(),
-        206,  # Partial Content
-        headers={
-            'Content-Range': f'bytes {byte_start}-{byte_end}/{file_size}',
-            'Accept-Ranges': 'bytes',
-            'Content-Length': str(content_length),
-            'Content-Type': mimetype,
-            'Content-Disposition': f'attachment; filename="{filename}"'
-        }
-    )
-    return response
+    return Response(body, 206, direct_passthrough=True, headers=[
+        ACCEPT_RANGES_HEADER,
+        ('Content-Range', f'bytes {byte_start}-{byte_end}/{file_size}'),
+        ('Content-Length', str(content_length)),
+        *file_headers
+    ])
 
-@app.route('/')
-def list_files():
-    """Enhanced file listing with size and download info"""
+def advise_sequential(fd, offset, count):
+    """Ask for aggressive readahead over the region and prefetch its first window"""
+    if HAS_FADVISE and count:
+        try:
+            os.posix_fadvise(fd, offset, count, os.POSIX_FADV_SEQUENTIAL)
+            os.posix_fadvise(fd, offset, min(count, READAHEAD_WINDOW), os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass
+
+def advise_done(fd, offset, count):
+    """Release a multi-GB region from the page cache after it has been streamed"""
+    if HAS_FADVISE and count >= DROP_CACHE_THRESHOLD:
+        try:
+            os.posix_fadvise(fd, offset, count, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass
+
+def read_region(file_path, offset, count):
+    """Yield count bytes of a file starting at offset, read straight from a raw descriptor"""
+    fd = os.open(file_path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+    if not HAS_PREAD:
+        os.lseek(fd, offset, os.SEEK_SET)
     try:
-        files_info = []
-        for filename in sorted(os.listdir(SHARE_DIR)):
-            file_path = os.path.join(SHARE_DIR, filename)
-            if os.path.isfile(file_path):
-                size = os.path.getsize(file_path)
-                size_str = format_file_size(size)
-                modified = time.strftime('%Y-%m-%d %H:%M', 
-                                       time.localtime(os.path.getmtime(file_path)))
-                files_info.append({
-                    'name': filename,
-                    'size': size_str,
-                    'modified': modified,
-                    'raw_size': size
-                })
-        
-        template = """
+        advise_sequential(fd, offset, count)
+        start, total = offset, count
+        while count > 0:
+            size = min(BUFFER_SIZE, count)
+            chunk = os.pread(fd, size, offset) if HAS_PREAD else os.read(fd, size)
+            if not chunk:
+                break
+            offset += len(chunk)
+            count -= len(chunk)
+            yield chunk
+        advise_done(fd, start, total)
+    finally:
+        os.close(fd)
+
+def start_prefetcher():
+    """Start this process's prefetch thread once (gunicorn workers each need their own)"""
+    global prefetch_pid
+    with prefetch_lock:
+        if prefetch_pid == os.getpid():
+            return
+        prefetch_pid = os.getpid()
+        with hit_lock:
+            hit_counter.clear()  # Counts inherited from the parent belong to another process
+    threading.Thread(target=prefetch_popular, daemon=True, name='prefetch').start()
+
+def prefetch_popular():
+    """Every PREFETCH_INTERVAL, ask the kernel to read ahead the most requested files"""
+    global hit_counter
+    while True:
+        time.sleep(PREFETCH_INTERVAL)
+        # Rank a detached Counter (last interval only, so cold files drop out);
+        # requests keep counting into the fresh one meanwhile
+        with hit_lock:
+            counts, hit_counter = hit_counter, collections.Counter()
+        try:
+            for file_path, _ in counts.most_common(PREFETCH_FILES):
+                prefetch_file(file_path)
+        except Exception as e:
+            # The thread is started once per process, so it must outlive any failure
+            print(f"⚠️ Prefetch pass failed: {e}")
+
+def prefetch_file(file_path):
+    """Ask the kernel to pull the first readahead window of a file into the page cache"""
+    try:
+        fd = os.open(file_path, os.O_RDONLY)
+    except OSError:
+        return  # Deleted or renamed since it was requested
+    try:
+        os.posix_fadvise(fd, 0, READAHEAD_WINDOW, os.POSIX_FADV_WILLNEED)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def sendfile_region(sock, file_path, offset, count):
+    """Copy a file region to the client socket inside the kernel with sendfile(2)"""
+    in_fd = os.open(file_path, os.O_RDONLY)
+    set_cork(sock, True)
+    try:
+        # An empty chunk makes the server send the status line and headers first
+        yield b''
+        out_fd = sock.fileno()
+        advise_sequential(in_fd, offset, count)
+        start, total = offset, count
+        while count > 0:
+            sent = os.sendfile(out_fd, in_fd, offset, count)
+            if not sent:
+                break  # File shrank while sending
+            offset += sent
+            count -= sent
+        advise_done(in_fd, start, total)
+    finally:
+        set_cork(sock, False)  # Uncorking flushes the final partial segment
+        os.close(in_fd)
+
+def set_cork(sock, enabled):
+    """Toggle TCP_CORK (TCP_NOPUSH on BSD/macOS) where the platform has it"""
+    if TCP_CORK_OPTION:
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, TCP_CORK_OPTION, int(enabled))
+        except OSError:
+            pass
+
+# Listing page, compiled once at import; styles are served separately so browsers cache them
+LISTING_TEMPLATE_SOURCE = """
         <!DOCTYPE html>
         <html>
         <head>
             <title>High-Speed File Server</title>
             <meta charset="utf-8">
-            <style>
-                body { 
-                    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; 
-                    margin: 0; 
-                    padding: 20px; 
-                    background: #f5f5f5; 
-                }
-                .container { 
-                    max-width: 1200px; 
-                    margin: 0 auto; 
-                    background: white; 
-                    padding: 30px; 
-                    border-radius: 10px; 
-                    box-shadow: 0 2px 10px rgba(0,0,0,0.1); 
-                }
-                h1 { 
-                    color: #333; 
-                    text-align: center; 
-                    margin-bottom: 30px; 
-                }
-                .stats {
-                    background: #e8f4f8;
-                    padding: 15px;
-                    border-radius: 5px;
-                    margin-bottom: 20px;
-                    text-align: center;
-                }
-                table { 
-                    width: 100%; 
-                    border-collapse: collapse; 
-                    margin-top: 20px; 
-                }
-                th, td { 
-                    padding: 12px; 
-                    text-align: left; 
-                    border-bottom: 1px solid #ddd; 
-                }
-                th { 
-                    background: #007acc; 
-                    color: white; 
-                    font-weight: bold; 
-                }
-                tr:hover { 
-                    background: #f8f9fa; 
-                }
-                a { 
-                    color: #007acc; 
-                    text-decoration: none; 
-                    font-weight: 500; 
-                }
-                a:hover { 
-                    text-decoration: underline; 
-                    color: #005a9e; 
-                }
-                .size { 
-                    text-align: right; 
-                    font-family: monospace; 
-                }
-                .download-btn {
-                    background: #28a745;
-                    color: white;
-                    padding: 6px 12px;
-                    border-radius: 4px;
-                    text-decoration: none;
-                    font-size: 12px;
-                }
-                .download-btn:hover {
-                    background: #218838;
-                    text-decoration: none;
-                    color: white;
-                }
-            </style>
+            <link rel="stylesheet" href="/static/listing.css">
         </head>
         <body>
             <div class="container">
@@ -247,14 +366,14 @@ def list_files():
                         {% for file in files_info %}
                         <tr>
                             <td>
-                                <a href="/{{ file.name }}" title="Click to download">
+                                <a href="/{{ file.name|urlencode }}" title="Click to download">
                                     {{ file.name }}
                                 </a>
                             </td>
                             <td class="size">{{ file.size }}</td>
                             <td>{{ file.modified }}</td>
                             <td>
-                                <a href="/{{ file.name }}" class="download-btn">
+                                <a href="/{{ file.name|urlencode }}" class="download-btn">
                                     Download
                                 </a>
                             </td>
@@ -276,28 +395,217 @@ def list_files():
         </body>
         </html>
         """
-        
-        total_size = sum(f['raw_size'] for f in files_info)
-        total_size_str = format_file_size(total_size)
-        
-        return render_template_string(template, 
-                                    files_info=files_info, 
-                                    total_size=total_size_str)
+
+LISTING_TEMPLATE = app.jinja_env.from_string(LISTING_TEMPLATE_SOURCE)
+
+LISTING_CSS = """\
+body { 
+    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; 
+    margin: 0; 
+    padding: 20px; 
+    background: #f5f5f5; 
+}
+.container { 
+    max-width: 1200px; 
+    margin: 0 auto; 
+    background: white; 
+    padding: 30px; 
+    border-radius: 10px; 
+    box-shadow: 0 2px 10px rgba(0,0,0,0.1); 
+}
+h1 { 
+    color: #333; 
+    text-align: center; 
+    margin-bottom: 30px; 
+}
+.stats {
+    background: #e8f4f8;
+    padding: 15px;
+    border-radius: 5px;
+    margin-bottom: 20px;
+    text-align: center;
+}
+table { 
+    width: 100%; 
+    border-collapse: collapse; 
+    margin-top: 20px; 
+}
+th, td { 
+    padding: 12px; 
+    text-align: left; 
+    border-bottom: 1px solid #ddd; 
+}
+th { 
+    background: #007acc; 
+    color: white; 
+    font-weight: bold; 
+}
+tr:hover { 
+    background: #f8f9fa; 
+}
+a { 
+    color: #007acc; 
+    text-decoration: none; 
+    font-weight: 500; 
+}
+a:hover { 
+    text-decoration: underline; 
+    color: #005a9e; 
+}
+.size { 
+    text-align: right; 
+    font-family: monospace; 
+}
+.download-btn {
+    background: #28a745;
+    color: white;
+    padding: 6px 12px;
+    border-radius: 4px;
+    text-decoration: none;
+    font-size: 12px;
+}
+.download-btn:hover {
+    background: #218838;
+    text-decoration: none;
+    color: white;
+}
+"""
+
+@app.route('/static/listing.css')
+def listing_css():
+    """Stylesheet for the listing page"""
+    return Response(LISTING_CSS, mimetype='text/css',
+                    headers=[CACHE_HEADER])
+
+PARALLEL_STAT_THRESHOLD = 200  # Above this many files, overlap stat() round trips (SMB/NFS shares)
+STAT_WORKERS = 16
+
+def stat_entry(entry):
+    """stat() a DirEntry, or None if the file was deleted since the scandir"""
+    try:
+        return entry.stat()
+    except FileNotFoundError:
+        return None
+
+def stat_entries(entries):
+    """stat() every DirEntry, in parallel for large directories"""
+    if len(entries) <= PARALLEL_STAT_THRESHOLD:
+        return [stat_entry(entry) for entry in entries]
+    with ThreadPoolExecutor(max_workers=STAT_WORKERS) as pool:
+        return list(pool.map(stat_entry, entries))
+
+# One listing row; tuples are lighter than per-file dicts and the template reads attributes
+FileRow = collections.namedtuple('FileRow', 'name size modified raw_size')
+
+# Rendered listing page, reused for a short TTL while SHARE_DIR is unchanged
+LISTING_TTL = 2.0
+listing_cache = {'ts': 0.0, 'dir_mtime': None, 'pages': None, 'etag': None}
+listing_lock = threading.Lock()
+refresh_lock = threading.Lock()  # Serializes rebuilds so a cache miss scans the directory once
+
+def html_response(pages, etag):
+    """Return the cached page in the best encoding the client accepts, or 304 if unchanged"""
+    encoding = None
+    if 'br' in pages and request.accept_encodings['br']:
+        encoding = 'br'
+    elif request.accept_encodings['gzip']:
+        encoding = 'gzip'
+    
+    headers = {'Vary': 'Accept-Encoding'}
+    if encoding:
+        etag = f'{etag}-{encoding}'
+        headers['Content-Encoding'] = encoding
+    headers['ETag'] = f'"{etag}"'
+    if request.if_none_match.contains(etag):
+        headers.pop('Content-Encoding', None)
+        return Response(status=304, headers=headers)
+    return Response(pages[encoding], mimetype='text/html', headers=headers)
+
+def refresh_listing():
+    """Scan SHARE_DIR and render the listing page into listing_cache"""
+    dir_mtime = os.stat(SHARE_DIR).st_mtime_ns
+    files_info = []
+    # scandir entries carry the file type, and each file is stat()ed only once
+    with os.scandir(SHARE_DIR) as it:
+        entries = sorted((entry for entry in it if entry.is_file()), key=lambda entry: entry.name)
+    total_size = 0
+    for entry, st in zip(entries, stat_entries(entries)):
+        if st is None:
+            continue  # Deleted mid-scan
+        size = st.st_size
+        total_size += size
+        files_info.append(FileRow(entry.name, format_file_size(size),
+                                  format_mtime(int(st.st_mtime)), size))
+    total_size_str = format_file_size(total_size)
+    
+    html = LISTING_TEMPLATE.render(files_info=files_info, 
+                                   total_size=total_size_str).encode('utf-8')
+    # Every encoding is produced once per cache refresh; None is the identity page
+    pages = {None: html, 'gzip': gzip.compress(html, compresslevel=6)}
+    if brotli:
+        pages['br'] = brotli.compress(html, quality=4)
+    etag = hashlib.blake2b(html, digest_size=8).hexdigest()
+    with listing_lock:
+        listing_cache.update(ts=time.monotonic(), dir_mtime=dir_mtime, pages=pages, etag=etag)
+    return pages, etag
+
+def cached_listing(dir_mtime):
+    """(pages, etag) from listing_cache if still fresh for this directory mtime, else None"""
+    with listing_lock:
+        if (listing_cache['pages'] is not None and listing_cache['dir_mtime'] == dir_mtime
+                and time.monotonic() - listing_cache['ts'] < LISTING_TTL):
+            return listing_cache['pages'], listing_cache['etag']
+    return None
+
+@app.route('/')
+def list_files():
+    """Enhanced file listing with size and download info"""
+    try:
+        # Polling clients get the cached bytes with a single stat of the directory
+        dir_mtime = os.stat(SHARE_DIR).st_mtime_ns
+        cached = cached_listing(dir_mtime)
+        if cached is None:
+            # One thread rescans and renders; concurrent misses wait and reuse its result
+            with refresh_lock:
+                cached = cached_listing(dir_mtime) or refresh_listing()
+        return html_response(*cached)
         
     except Exception as e:
         return f"Error listing files: {str(e)}", 500
 
+@functools.lru_cache(maxsize=4096)
+def format_mtime(seconds):
+    """Minute-resolution listing timestamp, memoized per mtime second"""
+    return datetime.fromtimestamp(seconds).isoformat(' ', 'minutes')
+
+SIZE_NAMES = ("B", "KB", "MB", "GB", "TB", "PB")
+
 def format_file_size(size_bytes):
     """Format file size in human readable format"""
     if size_bytes == 0:
         return "0 B"
     
-    size_names = ["B", "KB", "MB", "GB", "TB", "PB"]
-    import math
-    i = int(math.floor(math.log(size_bytes, 1024)))
-    p = math.pow(1024, i)
-    s = round(size_bytes / p, 2)
-    return f"{s} {size_names[i]}"
+    # Every unit is 2**10 of the previous one, so the bit length picks the unit
+    i = min((size_bytes.bit_length() - 1) // 10, len(SIZE_NAMES) - 1)
+    s = round(size_bytes / (1 << (i * 10)), 2)
+    return f"{s} {SIZE_NAMES[i]}"
+
+def run_with_waitress():
+    """Run with waitress: a fixed thread pool instead of a thread per request"""
+    try:
+        from waitress import serve
+    except ImportError:
+        print("⚠️ waitress not installed (pip install waitress) - using Flask development server")
+        return False
+    
+    serve(
+        app,
+        host='0.0.0.0',
+        port=8000,
+        threads=16,
+        cleanup_interval=30
+    )
+    return True
 
 if __name__ == "__main__":
     print("🚀 Starting High-Speed File Server...")
@@ -306,11 +614,12 @@ if __name__ == "__main__":
     print(f"🔧 Buffer size: {format_file_size(BUFFER_SIZE)}")
     print("✅ Features: Range requests, streaming, resume support, optimized buffers")
     
-    # Use optimized settings
-    app.run(
-        host='0.0.0.0', 
-        port=8000, 
-        threaded=True,  # Enable multi-threading
-        debug=False,    # Disable debug mode for better performance
-        request_handler=OptimizedRequestHandler
-    )
\ No newline at end of file
+    # Production server first, optimized development server as fallback
+    if not run_with_waitress():
+        app.run(
+            host='0.0.0.0', 
+            port=8000, 
+            threaded=True,  # Enable multi-threading
+            debug=False,    # Disable debug mode for better performance
+            request_handler=OptimizedRequestHandler
+        )
@@ -0,0 +1,144 @@
+import contextlib
+import gzip
+import os
+import tempfile
+
+import pytest
+
+import file_server
+
+TEXT = b'hello world\n' * 2000
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    share = tmp_path / 'share'
+    share.mkdir()
+    (share / 'notes.txt').write_bytes(TEXT)
+    (share / 'tiny.txt').write_bytes(b'tiny')
+    file_server.configure_share_dir(str(share))
+    monkeypatch.setattr(file_server, 'file_cache', file_server.FileMetadataCache(60))
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path / 'tmp'))
+    os.mkdir(tempfile.tempdir)
+    file_server.compression_cache_dir.cache_clear()
+    yield file_server.app.test_client()
+    file_server.compression_cache_dir.cache_clear()
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    """Count variant builds per encoding; adds a second, pass-through encoding"""
+    counts = {'gzip': 0, 'x-copy': 0}
+
+    def counting(name, encode):
+        def encoder(src, dst):
+            counts[name] += 1
+            encode(src, dst)
+        return encoder
+
+    monkeypatch.setitem(file_server.CONTENT_ENCODERS, 'gzip', counting('gzip', file_server.gzip_compress_file))
+    monkeypatch.setitem(file_server.CONTENT_ENCODERS, 'x-copy', counting('x-copy', lambda src, dst: dst.write(src.read())))
+    return counts
+
+
+def test_gzip_negotiated(client):
+    response = client.get('/notes.txt', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert response.headers['ETag'].endswith('-gzip"')
+    assert gzip.decompress(response.data) == TEXT
+
+
+@pytest.mark.parametrize('path, headers', [
+    ('/notes.txt', {}),
+    ('/notes.txt', {'Accept-Encoding': 'gzip;q=0'}),
+    ('/notes.txt', {'Accept-Encoding': 'gzip', 'Range': 'bytes=0-9'}),
+    ('/tiny.txt', {'Accept-Encoding': 'gzip'}),
+])
+def test_identity_served(client, path, headers):
+    response = client.get(path, headers=headers)
+    assert 'Content-Encoding' not in response.headers
+    assert not response.headers['ETag'].endswith('-gzip"')
+
+
+def test_variants_of_one_version_are_reused(client, builds):
+    for encoding in ('gzip', 'x-copy', 'gzip', 'x-copy'):
+        response = client.get('/notes.txt', headers={'Accept-Encoding': encoding})
+        assert response.headers['Content-Encoding'] == encoding
+    assert builds == {'gzip': 1, 'x-copy': 1}
+    assert len(os.listdir(file_server.compression_cache_dir())) == 2
+
+
+def test_shared_cache_dir_is_not_trusted(client, tmp_path):
+    if not hasattr(os, 'getuid'):
+        pytest.skip('per-user cache directory is POSIX only')
+    planted = tmp_path / 'tmp' / f'HighPerformanceFileServer-compressed-{os.getuid()}'
+    planted.mkdir()
+    planted.chmod(0o777)
+    response = client.get('/notes.txt', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+    assert response.data == TEXT
+
+
+def test_file_deleted_mid_scan_is_skipped(client, monkeypatch):
+    scandir = os.scandir
+
+    def scandir_then_delete(path):
+        with scandir(path) as it:
+            entries = list(it)
+        os.unlink(os.path.join(path, 'tiny.txt'))
+        return contextlib.nullcontext(entries)
+
+    monkeypatch.setattr(os, 'scandir', scandir_then_delete)
+    response = client.get('/notes.txt')
+    assert response.status_code == 200
+    assert response.data == TEXT
+    assert file_server.file_cache.lookup('tiny.txt') is None
+
+
+@pytest.mark.parametrize('range_header', ['bytes=0-1,5-6', 'bytes=abc', 'items=0-5', 'bytes=9-3'])
+def test_unusable_range_serves_whole_file(client, range_header):
+    response = client.get('/notes.txt', headers={'Range': range_header})
+    assert response.status_code == 200
+    assert response.data == TEXT
+
+
+def test_single_range(client):
+    response = client.get('/notes.txt', headers={'Range': 'bytes=10-19'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes 10-19/{len(TEXT)}'
+    assert response.data == TEXT[10:20]
+
+
+def test_suffix_range(client):
+    response = client.get('/notes.txt', headers={'Range': 'bytes=-5'})
+    assert response.status_code == 206
+    assert response.data == TEXT[-5:]
+
+
+def test_unsatisfiable_range(client):
+    response = client.get('/notes.txt', headers={'Range': f'bytes={len(TEXT)}-'})
+    assert response.status_code == 416
+
+
+def test_matching_etag_gets_304(client):
+    etag = client.get('/notes.txt').headers['ETag']
+    response = client.get('/notes.txt', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert response.data == b''
+
+
+def test_etag_of_other_encoding_gets_full_response(client):
+    etag = client.get('/notes.txt', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+    response = client.get('/notes.txt', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.data == TEXT
+
+
+def test_not_modified_since_gets_304(client):
+    last_modified = client.get('/notes.txt').headers['Last-Modified']
+    response = client.get('/notes.txt', headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 304
@@ -0,0 +1,32 @@
+import pytest
+
+import server_optimized
+
+DATA = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    (tmp_path / 'data.bin').write_bytes(DATA)
+    monkeypatch.setattr(server_optimized, 'SHARE_DIR', str(tmp_path))
+    return server_optimized.app.test_client()
+
+
+@pytest.mark.parametrize('range_header', ['bytes=0-1,5-6', 'bytes=abc'])
+def test_unusable_range_serves_whole_file(client, range_header):
+    response = client.get('/data.bin', headers={'Range': range_header})
+    assert response.status_code == 200
+    assert response.data == DATA
+
+
+def test_single_range(client):
+    response = client.get('/data.bin', headers={'Range': 'bytes=10-19'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes 10-19/{len(DATA)}'
+    assert response.data == DATA[10:20]
+
+
+def test_unsatisfiable_range(client):
+    response = client.get('/data.bin', headers={'Range': f'bytes={len(DATA)}-'})
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == f'bytes */{len(DATA)}'
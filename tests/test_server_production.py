@@ -0,0 +1,16 @@
+import collections
+
+import server_optimized
+import server_production
+
+
+def test_routes_registered_once():
+    assert server_production.app is server_optimized.app
+    rules = collections.Counter(rule.rule for rule in server_production.app.url_map.iter_rules())
+    assert {'/', '/<path:filename>'} <= set(rules)
+    assert max(rules.values()) == 1
+
+
+def test_production_settings_applied():
+    assert server_optimized.SHARE_DIR == server_production.SHARE_DIR
+    assert server_optimized.BUFFER_SIZE == server_production.BUFFER_SIZE